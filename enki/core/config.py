@@ -248,3 +248,9 @@ class Config():
     def _migrate_to_21(self):
         if not '.*' in self._data['NegativeFileFilter']:
             self._data['NegativeFileFilter'].insert(0, '.*')
+
+    def _migrate_to_22(self):
+        self._data['FuzzyOpen'] = {'ParallelScoring': True}
+
+    def _migrate_to_23(self):
+        self._data['Navigator']['BuiltInParsers'] = ['Python']
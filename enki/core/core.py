@@ -69,6 +69,7 @@ class Core(QObject):
         self._loadedPlugins = []
         self._cmdLine = {}
         self._project = None
+        self._toolRunner = None
 
     def _prepareToCatchSigInt(self):
         """Catch SIGINT signal to close the application
@@ -110,6 +111,10 @@ class Core(QObject):
         self._config = self._createConfig()
         profiler.stepDone('create config')
 
+        import enki.lib.toolrunner
+        self._toolRunner = enki.lib.toolrunner.ToolRunner()
+        profiler.stepDone('Create ToolRunner')
+
         import enki.core.uisettings  # pylint: disable=W0404
         self._uiSettingsManager = enki.core.uisettings.UISettingsManager()
         profiler.stepDone('Create UISettings')
@@ -170,6 +175,9 @@ class Core(QObject):
         if self._mainWindow is not None:
             self._mainWindow.terminate()
             self._mainWindow = None
+        if self._toolRunner is not None:
+            self._toolRunner.terminate()
+            self._toolRunner = None
         if self._config is not None:
             self._config = None
         if self._actionManager is not None:
@@ -301,6 +309,13 @@ class Core(QObject):
         """
         return self._uiSettingsManager
 
+    def toolRunner(self):
+        """::class:`enki.lib.toolrunner.ToolRunner` instance
+
+        Executes external tools. Use it instead of starting processes directly
+        """
+        return self._toolRunner
+
     def commandLineArgs(self):
         """ Dictionary of command line arguments, passed on Enki start
         """
@@ -3,146 +3,73 @@ document --- Opened file representation
 =======================================
 """
 
+import collections
 import os.path
 
 import sip
-from PyQt5.QtCore import pyqtSignal, QFileSystemWatcher, QObject, QTimer, pyqtSlot, QEvent
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, Qt
 from PyQt5.QtWidgets import QFileDialog, \
     QInputDialog, \
+    QLabel, \
     QMessageBox, \
     QPlainTextEdit, \
     QWidget, \
     QVBoxLayout, \
-    QApplication, \
     QStyle
 from PyQt5.QtGui import QColor, QFont, QIcon, QTextOption
 
 from qutepart import Qutepart
 
 from enki.core.core import core
-from enki.widgets.dockwidget import DockWidget
+from enki.core.filewatcher import fileDigest
 
 
-class _FileWatcher(QObject):
-    """File watcher.
+_MAX_HIGHLIGHTED_LINES = 100 * 1000
 
-    QFileSystemWatcher notifies client about any change (file access mode, modification date, etc.)
-    But, we need signal, only after file contents had been changed
-    """
-    modified = pyqtSignal(bool)
-    removed = pyqtSignal(bool)
-
-    def __init__(self, path):
-        QObject.__init__(self)
-        self._contents = None
-        self._watcher = QFileSystemWatcher(self)
-        self._timer = None
-        self._path = path
+_LoadedFile = collections.namedtuple('_LoadedFile', ['text', 'digest', 'decodeError', 'eolModes'])
 
-        self._lastEmittedModifiedStatus = None
-        self._lastEmittedRemovedStatus = None
 
-        self.setPath(path)
-        self.enable()
+def _detectEolModes(text):
+    """Get set of End Of Line symbols, which are used in the text
+    """
+    crlfCount = text.count('\r\n')
+    modes = set()
+    if crlfCount:
+        modes.add('\r\n')
+    if text.count('\n') > crlfCount:
+        modes.add('\n')
+    if text.count('\r') > crlfCount:
+        modes.add('\r')
+    return modes
 
-    def term(self):
-        self.disable()
-        sip.delete(self)
 
-    def enable(self):
-        """Enable signals from the watcher
-        """
-        self._watcher.fileChanged.connect(self._onFileChanged)
+def _loadFile(filePath):
+    """Read and decode the file, detect EOL mode. Syntax is detected in the GUI thread.
 
-    def disable(self):
-        """Disable signals from the watcher
-        """
-        self._watcher.fileChanged.disconnect(self._onFileChanged)
-        self._stopTimer()
-
-    def setContents(self, contents):
-        """Set file contents. Watcher uses it to compare old and new contents of the file.
-        """
-        self._contents = contents
-        # Qt File watcher may work incorrectly, if file was not existing, when it started
-        if not self._watcher.files():
-            self.setPath(self._path)
-        self._lastEmittedModifiedStatus = None
-        self._lastEmittedRemovedStatus = None
-
-    def setPath(self, path):
-        """Path had been changed or file had been created. Set new path
-        """
-        if self._watcher.files():
-            self._watcher.removePaths(self._watcher.files())
-        if path is not None and os.path.isfile(path):
-            self._watcher.addPath(path)
-        self._path = path
-        self._lastEmittedModifiedStatus = None
-        self._lastEmittedRemovedStatus = None
-
-    def _emitModifiedStatus(self):
-        """Emit self.modified signal with right status
-        """
-        isModified = self._contents != self._safeRead(self._path)
-        if isModified != self._lastEmittedModifiedStatus:
-            self.modified.emit(isModified)
-            self._lastEmittedModifiedStatus = isModified
+    Doesn't touch GUI, therefore, may be executed in a thread. Raises ``OSError``
+    """
+    with open(filePath, 'rb') as openedFile:
+        data = openedFile.read()
 
-    def _emitRemovedStatus(self, isRemoved):
-        """Emit 'removed', if status changed"""
-        if isRemoved != self._lastEmittedRemovedStatus:
-            self._lastEmittedRemovedStatus = isRemoved
-            self.removed.emit(isRemoved)
+    digest = fileDigest(filePath, data)
 
-    @pyqtSlot()
-    def _onFileChanged(self):
-        """File changed. Emit own signal, if contents changed
-        """
-        if os.path.exists(self._path):
-            self._emitModifiedStatus()
-        else:
-            self._emitRemovedStatus(True)
+    try:
+        text = str(data, 'utf8')
+        decodeError = None
+    except UnicodeDecodeError as ex:
+        text = str(data, 'utf8', 'replace')
+        decodeError = str(ex)
+    del data
 
-        # Sometimes QFileSystemWatcher emits only 1 signal for 2 modifications
-        # Check once more later
-        self._startTimer()
+    # Strip last EOL. Qutepart adds it when saving file
+    if text.endswith('\r\n'):
+        text = text[:-2]
+    elif text.endswith('\r') or text.endswith('\n'):
+        text = text[:-1]
 
-    def _startTimer(self):
-        """Init a timer.
-        It is used for monitoring file after deletion.
-        Git removes file, than restores it.
-        """
-        if self._timer is None:
-            self._timer = QTimer()
-            self._timer.setInterval(500)
-            self._timer.timeout.connect(self._onCheckIfDeletedTimer)
-        self._timer.start()
-
-    def _stopTimer(self):
-        """Stop timer, if exists
-        """
-        if self._timer is not None:
-            self._timer.stop()
+    eolModes = _detectEolModes(text)
 
-    @pyqtSlot()
-    def _onCheckIfDeletedTimer(self):
-        """Check, if file has been restored
-        """
-        if os.path.exists(self._path):
-            self.setPath(self._path)  # restart Qt file watcher after file has been restored
-            self._stopTimer()
-            self._emitRemovedStatus(False)
-            self._emitModifiedStatus()
-
-    def _safeRead(self, path):
-        """Read file. Ignore exceptions
-        """
-        try:
-            with open(path, 'rb') as file:
-                return file.read()
-        except (OSError, IOError):
-            return None
+    return _LoadedFile(text, digest, decodeError, eolModes)
 
 
 class Document(QWidget):
@@ -158,29 +85,40 @@ class Document(QWidget):
     documentDataChanged()
 
     **Signal** emitted, when document icon or toolTip has changed
-    (i.e. document has been modified externally)
+    (i.e. document has been saved).
+    External modifications are reported with ``core.workspace().documentsExternallyChanged``
+    """
+
+    loaded = pyqtSignal()
+    """
+    loaded()
+
+    **Signal** emitted, when the file, which is loaded in the background, has been loaded.
+    See :meth:`isLoaded`
     """
 
     _EOL_CONVERTOR = {r'\r\n': '\r\n',
                       r'\n': '\n',
                       r'\r': '\r'}
 
-    def __init__(self, parentObject, filePath, createNew=False):
+    def __init__(self, parentObject, filePath, createNew=False, loader=None, deferLoading=False):
         """Create editor and open file.
         If file is None or createNew is True, empty not saved file is created
         IO Exceptions are not catched, therefore, must be catched on upper level
+
+        If ``loader`` (:mod:`enki.lib.future` controller) is set, the file is read and decoded in the background.
+        A placeholder is shown and the editor is read-only until the file is loaded.
+        If ``deferLoading`` is set too, loading is not started until :meth:`startLoading` is called
         """
         QWidget.__init__(self, parentObject)
         self._neverSaved = filePath is None or createNew
         self._filePath = filePath
         self._externallyRemoved = False
         self._externallyModified = False
+        # Set by the document, compared and updated by the workspace file watcher
+        self._fileDigest = None
         # File opening should be implemented in the document classes
 
-        self._fileWatcher = _FileWatcher(filePath)
-        self._fileWatcher.modified.connect(self._onWatcherFileModified)
-        self._fileWatcher.removed.connect(self._onWatcherFileRemoved)
-
         self.qutepart = Qutepart(self)
 
         #self.qutepart.setStyleSheet('QPlainTextEdit {border: 0}')
@@ -195,21 +133,113 @@ class Document(QWidget):
         layout.addWidget(self.qutepart)
         self.setFocusProxy(self.qutepart)
 
-        if not self._neverSaved:
-            originalText = self._readFile(filePath)
-            self.qutepart.text = originalText
+        self._loader = loader
+        self._loadFuture = None
+        self._loadDeferred = False
+        self._placeholder = None
+        if self._neverSaved:
+            self._configureEolMode(set())
+            self._tryDetectSyntax()
+        elif loader is not None:
+            self._filePath = os.path.abspath(filePath)
+            self._showPlaceholder()
+            self._loadDeferred = True
+            if not deferLoading:
+                self.startLoading()
         else:
-            originalText = ''
-
-        # autodetect eol, if need
-        self._configureEolMode(originalText)
+            self._applyLoadedFile(self._readFile(filePath))
+
+    def _showPlaceholder(self):
+        self._placeholder = QLabel(self.tr('Loading {}...').format(self._filePath), self)
+        self._placeholder.setAlignment(Qt.AlignCenter)
+        self.layout().addWidget(self._placeholder)
+        self.qutepart.setVisible(False)
+        self.qutepart.setReadOnly(True)
+
+    def _hidePlaceholder(self):
+        self.layout().removeWidget(self._placeholder)
+        sip.delete(self._placeholder)
+        self._placeholder = None
+        self.qutepart.setReadOnly(False)
+        self.qutepart.setVisible(True)
+
+    def _showDecodeError(self, loadedFile):
+        """Show QMessageBox, if UnicodeDecodeError happened
+        """
+        if loadedFile.decodeError is not None:
+            QMessageBox.critical(None,
+                                 self.tr("Can not decode file"),
+                                 self._filePath + '\n' +
+                                 loadedFile.decodeError +
+                                 '\nProbably invalid encoding was set. ' +
+                                 'You may corrupt your file, if saved it')
 
+    def _applyLoadedFile(self, loadedFile):
+        """Set loaded text to the editor. Configure EOL and detect syntax
+        """
+        self._fileDigest = loadedFile.digest
+        self._showDecodeError(loadedFile)
+        self.qutepart.text = loadedFile.text
+        self._configureEolMode(loadedFile.eolModes)
         self._tryDetectSyntax()
 
-        QApplication.instance().installEventFilter(self)
+    def _onLoaded(self, future):
+        """Background loading has finished
+        """
+        self._loadFuture = None
+        try:
+            loadedFile = future.result
+        except (OSError, IOError) as ex:
+            QMessageBox.critical(core.mainWindow(),
+                                 self.tr("Failed to open the file"),
+                                 str(ex))
+            core.workspace().closeDocument(self)
+            return
+
+        self._finishLoading(loadedFile)
+
+    def _finishLoading(self, loadedFile):
+        self._hidePlaceholder()
+        self._applyLoadedFile(loadedFile)
+        self.loaded.emit()
+
+    def startLoading(self):
+        """Start loading the file in the background, if loading has been deferred
+        """
+        if self._loadDeferred:
+            self._loadDeferred = False
+            self._loadFuture = self._loader.start(self._onLoaded, _loadFile, self._filePath)
+
+    def isLoadingDeferred(self):
+        """Check if loading of the file hasn't been started yet. See :meth:`startLoading`
+        """
+        return self._loadDeferred
+
+    def isLoaded(self):
+        """Check if the file has been loaded. Files might be loaded in the background
+        """
+        return self._loadFuture is None and not self._loadDeferred
+
+    def waitForLoaded(self):
+        """Load the file now, if it is being loaded in the background.
+
+        Call it before using the text, which might be not loaded yet.
+        Raises ``OSError`` and closes the document, if failed to load
+        """
+        if not self.isLoaded():
+            if self._loadFuture is not None:
+                self._loadFuture.cancel(True)
+            self._loadFuture = None
+            self._loadDeferred = False
+            try:
+                loadedFile = _loadFile(self._filePath)
+            except (OSError, IOError):
+                core.workspace().closeDocument(self)
+                raise
+            self._finishLoading(loadedFile)
 
     def _tryDetectSyntax(self):
-        if len(self.qutepart.lines) > (100 * 1000) and \
+        if len(self.qutepart.lines) > _MAX_HIGHLIGHTED_LINES and \
            self.qutepart.language() is None:
             """Qutepart uses too lot of memory when highlighting really big files
             It may crash the editor, so, do not highlight really big files.
@@ -223,7 +253,8 @@ class Document(QWidget):
     def terminate(self):
         """Explicytly called destructor
         """
-        self._fileWatcher.term()
+        if self._loadFuture is not None:
+            self._loadFuture.cancel(True)
 
         # avoid emitting signals, document shall behave like it is already dead
         self.qutepart.document().modificationChanged.disconnect()
@@ -233,48 +264,12 @@ class Document(QWidget):
         self.qutepart.terminate()  # stop background highlighting, free memory
         sip.delete(self)
 
-    @pyqtSlot(bool)
-    def _onWatcherFileModified(self, modified):
-        """File has been modified
-        """
-        self._externallyModified = modified
-        self.documentDataChanged.emit()
-
-    @pyqtSlot(bool)
-    def _onWatcherFileRemoved(self, isRemoved):
-        """File has been removed
-        """
-        self._externallyRemoved = isRemoved
-        self.documentDataChanged.emit()
-
     def _readFile(self, filePath):
-        """Read the file contents.
-        Shows QMessageBox for UnicodeDecodeError
+        """Read the file contents in the GUI thread. See :func:`_loadFile`
         """
-        with open(filePath, 'rb') as openedFile:  # Exception is ok, raise it up
-            self._filePath = os.path.abspath(filePath)  # abspath won't fail, if file exists
-            data = openedFile.read()
-
-        self._fileWatcher.setContents(data)
-
-        try:
-            text = str(data, 'utf8')
-        except UnicodeDecodeError as ex:
-            QMessageBox.critical(None,
-                                 self.tr("Can not decode file"),
-                                 filePath + '\n' +
-                                 str(ex) +
-                                 '\nProbably invalid encoding was set. ' +
-                                 'You may corrupt your file, if saved it')
-            text = str(data, 'utf8', 'replace')
-
-        # Strip last EOL. Qutepart adds it when saving file
-        if text.endswith('\r\n'):
-            text = text[:-2]
-        elif text.endswith('\r') or text.endswith('\n'):
-            text = text[:-1]
-
-        return text
+        loadedFile = _loadFile(filePath)  # Exception is ok, raise it up
+        self._filePath = os.path.abspath(filePath)  # abspath won't fail, if file exists
+        return loadedFile
 
     def isExternallyModified(self):
         """Check if document's file has been modified externally.
@@ -290,6 +285,29 @@ class Document(QWidget):
         """
         return self._externallyRemoved
 
+    def fileDigest(self):
+        """Digest of the file contents, when the file has been loaded or saved last time.
+
+        Used by the workspace file watcher. ``None``, if unknown
+        """
+        return self._fileDigest
+
+    def setExternallyChanged(self, removed, modified, digest):
+        """Update external modification status and the file digest. Called by the workspace file watcher.
+
+        Modification status is kept while the file is removed.
+        Return ``True``, if the status has changed
+        """
+        self._fileDigest = digest
+        if removed:
+            changed = not self._externallyRemoved
+            self._externallyRemoved = True
+        else:
+            changed = self._externallyRemoved or self._externallyModified != modified
+            self._externallyRemoved = False
+            self._externallyModified = modified
+        return changed
+
     def isNeverSaved(self):
         """Check if document has been created, but never has been saved on disk
         """
@@ -317,7 +335,7 @@ class Document(QWidget):
         """
         core.workspace().documentClosed.emit(self)
         self._filePath = newPath
-        self._fileWatcher.setPath(newPath)
+        self._fileDigest = None
         self._neverSaved = True
         core.workspace().documentOpened.emit(self)
         core.workspace().currentDocumentChanged.emit(self, self)
@@ -333,6 +351,19 @@ class Document(QWidget):
         else:
             pass  # Do not enter with statement, because it causes wrong textChanged signal
 
+    def _loadBeforeSaving(self):
+        """Load the file, if it is being loaded in the background, to save the whole text.
+
+        Return ``False``, if failed. The document has been closed in this case
+        """
+        try:
+            self.waitForLoaded()
+        except (OSError, IOError) as ex:
+            # The document is deleted, self.tr() is not available
+            QMessageBox.critical(core.mainWindow(), "Cannot save file", str(ex))
+            return False
+        return True
+
     def _saveToFs(self, filePath):
         """Low level method. Always saves file, even if not modified
         """
@@ -353,18 +384,16 @@ class Document(QWidget):
         # Write file
         data = text.encode('utf8')
 
-        self._fileWatcher.disable()
         try:
             with open(filePath, 'wb') as openedFile:
                 openedFile.write(data)
-            self._fileWatcher.setContents(data)
         except IOError as ex:
             QMessageBox.critical(None,
                                  self.tr("Cannot write to file"),
                                  str(ex))
             return
-        finally:
-            self._fileWatcher.enable()
+
+        self._fileDigest = fileDigest(filePath, data)
 
         # Update states
         self._neverSaved = False
@@ -380,8 +409,11 @@ class Document(QWidget):
         """Save the file to file system.
 
         Show QFileDialog if file name is not known.
-        Return False, if user cancelled QFileDialog, True otherwise
+        Return False, if user cancelled QFileDialog or the file failed to load, True otherwise
         """
+        if not self._loadBeforeSaving():
+            return False
+
         # Get path
         if not self._filePath:
             path, _ = QFileDialog.getSaveFileName(self, self.tr('Save file as...'))
@@ -399,6 +431,9 @@ class Document(QWidget):
     def saveFileAs(self):
         """Ask for new file name with dialog. Save file
         """
+        if not self._loadBeforeSaving():
+            return
+
         if self._filePath:
             default_filename = os.path.basename(self._filePath)
         else:
@@ -414,11 +449,20 @@ class Document(QWidget):
         """Reload the file from the disk
 
         If child class reimplemented this method, it MUST call method of the parent class
-        for update internal bookkeeping"""
+        for update internal bookkeeping.
 
-        text = self._readFile(self.filePath())
+        Raises ``OSError``. If the file hasn't been loaded yet, it is loaded now.
+        The document is closed, if it fails, see :meth:`waitForLoaded`"""
+
+        if not self.isLoaded():
+            self.waitForLoaded()  # reads the current contents
+            return
+
+        loadedFile = self._readFile(self.filePath())
+        self._fileDigest = loadedFile.digest
+        self._showDecodeError(loadedFile)
         pos = self.qutepart.cursorPosition
-        self.qutepart.text = text
+        self.qutepart.text = loadedFile.text
         self._externallyModified = False
         self._externallyRemoved = False
         self.qutepart.cursorPosition = pos
@@ -480,18 +524,9 @@ class Document(QWidget):
         """
         raise NotImplemented()
 
-    def _configureEolMode(self, originalText):
-        """Detect end of line mode automatically and apply detected mode
+    def _configureEolMode(self, modes):
+        """Apply End Of Line mode, detected by :func:`_detectEolModes`
         """
-        modes = set()
-        for line in originalText.splitlines(True):
-            if line.endswith('\r\n'):
-                modes.add('\r\n')
-            elif line.endswith('\n'):
-                modes.add('\n')
-            elif line.endswith('\r'):
-                modes.add('\r')
-
         if len(modes) == 1:  # exactly one
             detectedMode = modes.pop()
         else:
@@ -553,21 +588,3 @@ class Document(QWidget):
             self.qutepart.eol = self._EOL_CONVERTOR[conf['EOL']['Mode']]
 
         # Whitespace visibility is managed by qpartsettings plugin
-
-    def eventFilter(self, obj, event):
-        """An event filter that looks for focus in events, closing any floating
-           docks when found."""
-
-        # Note: We can't ``def focusInEvent(self, focusEvent)`` since qutepart
-        # is the focus proxy, meaning this won't be called. Hence, the neeed for
-        # an event listener.
-        if (event.type() == QEvent.FocusIn and
-          (obj == self or obj == self.focusProxy()) ):
-            for dock in core.mainWindow().findChildren(DockWidget):
-                # Close all unpinned docks. The exception: if the Open Files
-                # dock is waiting for the Ctrl button to be released, keep it
-                # open; it will be be closed when Ctrl is released.
-                if not dock.isPinned() and (not getattr(dock, '_waitForCtrlRelease', False)):
-                    dock._close()
-
-        return QWidget.eventFilter(self, obj, event)
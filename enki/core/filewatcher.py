@@ -0,0 +1,241 @@
+"""
+filewatcher --- Detects external modifications of the opened files
+==================================================================
+
+One watcher serves all documents of the workspace.
+
+* Parent directories of the files are watched. They notify about removed, created and replaced files.
+  Files are watched too, while the count of watched files is under the limit. They notify about
+  modifications in place
+* Notifications are collected during a short interval. Then the files are checked in a thread pool
+* The file is read only if the size is the same, but the modification time has changed.
+  A digest of the contents is compared, the watcher doesn't keep a copy of the contents
+* Changed documents are reported with a single signal
+"""
+
+import collections
+import hashlib
+import os
+import os.path
+
+from PyQt5.QtCore import pyqtSignal, QFileSystemWatcher, QObject, QTimer
+
+from enki.lib.future import AsyncController
+
+
+_FileDigest = collections.namedtuple('_FileDigest', ['size', 'mtime', 'hash'])
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_MAX_WATCHED_FILES = 1000  # inotify watches are limited. Other files are detected by the directory changes
+_COLLECT_INTERVAL_MS = 50
+
+
+def fileDigest(path, contents):
+    """Digest of the file contents, which have been just read or written.
+    ``None`` if failed to stat the file
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _FileDigest(len(contents), stat.st_mtime_ns, hashlib.sha1(contents).digest())
+
+
+def _hashFile(path):
+    """Hash the file by chunks. Return ``None`` on error
+    """
+    hash_ = hashlib.sha1()
+    try:
+        with open(path, 'rb') as file_:
+            for chunk in iter(lambda: file_.read(_HASH_CHUNK_SIZE), b''):
+                hash_.update(chunk)
+    except (OSError, IOError):
+        return None
+    return hash_.digest()
+
+
+def _checkFile(path, digest):
+    """Compare the file with the digest.
+
+    Return ``(isRemoved, isModified, digest)``. The returned digest has updated modification time,
+    if the file has been touched, but not modified
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return True, False, digest
+
+    if digest is None:
+        return False, True, digest
+    if stat.st_size != digest.size:
+        return False, True, digest
+    if stat.st_mtime_ns == digest.mtime:
+        return False, False, digest
+
+    if _hashFile(path) != digest.hash:
+        return False, True, digest
+
+    # Do not hash it next time
+    return False, False, digest._replace(mtime=stat.st_mtime_ns)
+
+
+def _checkFiles(tasks):
+    """Worker thread function. ``tasks`` is a list of ``(path, digest)``
+    """
+    return [_checkFile(path, digest) for path, digest in tasks]
+
+
+class FileWatcher(QObject):
+    """Watches files of the workspace documents.
+
+    Documents are added and removed on ``documentOpened`` and ``documentClosed`` workspace signals
+    """
+
+    documentsChanged = pyqtSignal(list)
+    """
+    documentsChanged([documents])
+
+    **Signal** emitted, when external modification or removal status of the documents has changed
+    """
+
+    def __init__(self, workspace):
+        QObject.__init__(self, workspace)
+        self._workspace = workspace
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._onFileChanged)
+        self._watcher.directoryChanged.connect(self._onDirectoryChanged)
+
+        self._controller = AsyncController(2)
+        self._batchNumber = 0
+
+        self._documentPaths = {}  # document: path
+        self._pathDocuments = {}  # path: set of documents
+        self._dirPaths = {}  # directory path: set of file paths
+        self._lastCheckedBatch = {}  # document: number of the last applied batch
+
+        self._pendingPaths = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(_COLLECT_INTERVAL_MS)
+        self._timer.timeout.connect(self._checkPendingPaths)
+
+        workspace.documentOpened.connect(self._addDocument)
+        workspace.documentClosed.connect(self._removeDocument)
+
+    def terminate(self):
+        self._workspace.documentOpened.disconnect(self._addDocument)
+        self._workspace.documentClosed.disconnect(self._removeDocument)
+        self._timer.stop()
+        self._controller.terminate()
+
+    def _addDocument(self, document):
+        path = document.filePath()
+        if path is None:
+            return
+
+        path = os.path.abspath(path)
+        self._documentPaths[document] = path
+
+        if path not in self._pathDocuments:
+            self._pathDocuments[path] = set()
+            dirPath = os.path.dirname(path)
+            if dirPath not in self._dirPaths:
+                self._dirPaths[dirPath] = set()
+                if os.path.isdir(dirPath):
+                    self._watcher.addPath(dirPath)
+            self._dirPaths[dirPath].add(path)
+            self._watchFile(path)
+        self._pathDocuments[path].add(document)
+
+    def _removeDocument(self, document):
+        path = self._documentPaths.pop(document, None)
+        self._lastCheckedBatch.pop(document, None)
+        if path is None:
+            return
+
+        documents = self._pathDocuments[path]
+        documents.discard(document)
+        if documents:
+            return
+
+        del self._pathDocuments[path]
+        self._pendingPaths.discard(path)
+        if path in self._watcher.files():
+            self._watcher.removePath(path)
+
+        dirPath = os.path.dirname(path)
+        self._dirPaths[dirPath].discard(path)
+        if not self._dirPaths[dirPath]:
+            del self._dirPaths[dirPath]
+            if dirPath in self._watcher.directories():
+                self._watcher.removePath(dirPath)
+
+    def _watchFile(self, path, watchedFiles=None):
+        """Watch the file, if the limit allows. ``watchedFiles`` is a set of watched files, it is updated
+        """
+        if watchedFiles is None:
+            watchedFiles = set(self._watcher.files())
+        if len(watchedFiles) < _MAX_WATCHED_FILES and \
+           path not in watchedFiles and \
+           os.path.isfile(path):
+            self._watcher.addPath(path)
+            watchedFiles.add(path)
+
+    def _onFileChanged(self, path):
+        if path in self._pathDocuments:
+            self._pendingPaths.add(path)
+            self._startTimer()
+
+    def _onDirectoryChanged(self, dirPath):
+        paths = self._dirPaths.get(dirPath)
+        if paths:
+            self._pendingPaths.update(paths)
+            self._startTimer()
+
+    def _startTimer(self):
+        """Not restarted by the following notifications. Long operation is checked by few batches
+        """
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _checkPendingPaths(self):
+        """Check collected files in the thread pool
+        """
+        self._batchNumber += 1
+        documents = []
+        tasks = []
+        for path in self._pendingPaths:
+            for document in self._pathDocuments[path]:
+                if document.isLoaded() and not document.isNeverSaved():
+                    documents.append(document)
+                    tasks.append((path, document.fileDigest()))
+        self._pendingPaths = set()
+
+        if tasks:
+            batchNumber = self._batchNumber
+            self._controller.start(lambda future: self._onChecked(batchNumber, documents, tasks, future),
+                                   _checkFiles, tasks)
+
+    def _onChecked(self, batchNumber, documents, tasks, future):
+        """Apply results of the check. Results are dropped, if the document has been closed, saved or reloaded,
+        or if the newer check has been already applied
+        """
+        changedDocuments = []
+        watchedFiles = set(self._watcher.files())
+        for document, (path, digest), result in zip(documents, tasks, future.result):
+            if self._documentPaths.get(document) != path or \
+               document.fileDigest() is not digest or \
+               self._lastCheckedBatch.get(document, 0) > batchNumber:
+                continue
+
+            self._lastCheckedBatch[document] = batchNumber
+            isRemoved, isModified, newDigest = result
+            if not isRemoved:
+                # QFileSystemWatcher stops watching removed and replaced file
+                self._watchFile(path, watchedFiles)
+
+            if document.setExternallyChanged(isRemoved, isModified, newDigest):
+                changedDocuments.append(document)
+
+        if changedDocuments:
+            self.documentsChanged.emit(changedDocuments)
@@ -0,0 +1,328 @@
+"""
+largefile --- Read-only viewer for files, which are too big for the editor
+==========================================================================
+
+The file is memory-mapped and never loaded completely.
+A sparse line index is built in the background. Only visible lines are read and drawn.
+Go to line and search work over the mapped file.
+
+The viewer is a separate window, not a :class:`enki.core.document.Document`.
+Plugins work with the editor of the documents, which the viewer doesn't have
+"""
+
+import array
+import bisect
+import mmap
+
+from PyQt5.QtCore import pyqtSignal, QRect, QThread, QTimer, Qt
+from PyQt5.QtGui import QFont, QPainter, QPalette
+from PyQt5.QtWidgets import QAbstractScrollArea, QHBoxLayout, QInputDialog, QLabel, QLineEdit, \
+    QPushButton, QVBoxLayout, QWidget
+
+from enki.core.core import core
+
+
+_CHECKPOINT_INTERVAL = 1024 * 1024  # bytes between the line index checkpoints
+_SEARCH_WINDOW = 64 * 1024 * 1024  # bytes searched between checks of the stop flag
+_MAX_LINE_LENGTH = 10 * 1000  # bytes of the line, which are shown
+_INDEX_STATUS_UPDATE_MS = 200
+
+
+class LineIndex:
+    """Sparse index of lines of a mapped file.
+
+    For every checkpoint (offset, divisible by the interval) the count of line breaks before it is stored.
+    Start of a line is found by scanning from the nearest checkpoint.
+
+    :meth:`build` runs in a thread. Other methods may be called while it runs
+    """
+
+    def __init__(self, mappedFile):
+        self._mm = mappedFile
+        self._size = len(mappedFile)
+        self._breaksBefore = array.array('Q', [0])  # line breaks before every checkpoint
+        self._breakCount = 0  # line breaks in the indexed part
+        self._isComplete = False
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def build(self):
+        """Count line breaks by chunks. Return ``False``, if stopped
+        """
+        for start in range(0, self._size, _CHECKPOINT_INTERVAL):
+            if self._stop:
+                return False
+            self._breakCount += self._mm[start:start + _CHECKPOINT_INTERVAL].count(b'\n')
+            self._breaksBefore.append(self._breakCount)
+
+        self._isComplete = True
+        return True
+
+    def isComplete(self):
+        return self._isComplete
+
+    def progress(self):
+        """Indexed part of the file in percents
+        """
+        return min(100, (len(self._breaksBefore) - 1) * _CHECKPOINT_INTERVAL * 100 // max(self._size, 1))
+
+    def lineCount(self):
+        """Count of lines in the indexed part of the file
+        """
+        return self._breakCount + 1
+
+    def lineOffset(self, lineNumber):
+        """Offset of the start of the indexed line
+        """
+        if lineNumber == 0:
+            return 0
+
+        breaksBefore = self._breaksBefore[:]  # the copy is not modified by the thread
+        checkpoint = bisect.bisect_left(breaksBefore, lineNumber) - 1
+        offset = checkpoint * _CHECKPOINT_INTERVAL - 1
+        for _ in range(lineNumber - breaksBefore[checkpoint]):
+            offset = self._mm.find(b'\n', offset + 1)
+        return offset + 1
+
+    def lineNumber(self, offset):
+        """Number of the line, which contains the offset. Counts line breaks after the indexed part, if necessary
+        """
+        breaksBefore = self._breaksBefore[:]
+        checkpoint = min(offset // _CHECKPOINT_INTERVAL, len(breaksBefore) - 1)
+        count = breaksBefore[checkpoint]
+        for start in range(checkpoint * _CHECKPOINT_INTERVAL, offset, _CHECKPOINT_INTERVAL):
+            count += self._mm[start:min(start + _CHECKPOINT_INTERVAL, offset)].count(b'\n')
+        return count
+
+
+class _IndexerThread(QThread):
+    def __init__(self, lineIndex):
+        QThread.__init__(self)
+        self._lineIndex = lineIndex
+
+    def run(self):
+        self._lineIndex.build()
+
+
+class _SearchThread(QThread):
+    """Searches the pattern in the mapped file by windows. Emits ``found(offset, line number)`` or ``notFound()``
+    """
+    found = pyqtSignal(int, int)
+    notFound = pyqtSignal()
+
+    def __init__(self, mappedFile, lineIndex, pattern, startOffset):
+        QThread.__init__(self)
+        self._mm = mappedFile
+        self._lineIndex = lineIndex
+        self._pattern = pattern
+        self._startOffset = startOffset
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def _find(self, start, end):
+        for windowStart in range(start, end, _SEARCH_WINDOW):
+            if self._stop:
+                return None
+            windowEnd = min(windowStart + _SEARCH_WINDOW + len(self._pattern) - 1, end)
+            offset = self._mm.find(self._pattern, windowStart, windowEnd)
+            if offset != -1:
+                return offset
+        return -1
+
+    def run(self):
+        # Search till the end of the file, then from the beginning
+        offset = self._find(self._startOffset, len(self._mm))
+        if offset == -1:
+            offset = self._find(0, min(self._startOffset + len(self._pattern) - 1, len(self._mm)))
+
+        if offset is None:  # stopped
+            return
+        elif offset == -1:
+            self.notFound.emit()
+        else:
+            self.found.emit(offset, self._lineIndex.lineNumber(offset))
+
+
+class _LargeFileView(QAbstractScrollArea):
+    """Draws visible lines of the mapped file
+    """
+
+    def __init__(self, parent, mappedFile, lineIndex):
+        QAbstractScrollArea.__init__(self, parent)
+        self._mm = mappedFile
+        self._lineIndex = lineIndex
+        self._match = None  # (line number, start offset, end offset)
+        self._maxLineWidth = 0
+
+        conf = core.config()['Qutepart']
+        self.setFont(QFont(conf['Font']['Family'], conf['Font']['Size']))
+        self.verticalScrollBar().setSingleStep(1)
+        self.updateScrollBars()
+
+    def _lineHeight(self):
+        return self.fontMetrics().height()
+
+    def _visibleLineCount(self):
+        return max(1, self.viewport().height() // self._lineHeight())
+
+    def updateScrollBars(self):
+        visibleLineCount = self._visibleLineCount()
+        self.verticalScrollBar().setPageStep(visibleLineCount)
+        self.verticalScrollBar().setRange(0, max(0, self._lineIndex.lineCount() - visibleLineCount))
+        self.horizontalScrollBar().setPageStep(self.viewport().width())
+        self.horizontalScrollBar().setRange(0, max(0, self._maxLineWidth - self.viewport().width()))
+
+    def resizeEvent(self, event):
+        QAbstractScrollArea.resizeEvent(self, event)
+        self.updateScrollBars()
+
+    def scrollToLine(self, lineNumber):
+        """Show the line in the middle of the view
+        """
+        self.verticalScrollBar().setValue(lineNumber - self._visibleLineCount() // 2)
+        self.viewport().update()
+
+    def setMatch(self, lineNumber, startOffset, endOffset):
+        self._match = (lineNumber, startOffset, endOffset)
+        self.scrollToLine(lineNumber)
+
+    def _lineText(self, start, end):
+        return self._mm[start:min(end, start + _MAX_LINE_LENGTH)].decode('utf8', 'replace').rstrip('\r')
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        metrics = self.fontMetrics()
+        lineHeight = self._lineHeight()
+        xOffset = -self.horizontalScrollBar().value()
+
+        firstLine = self.verticalScrollBar().value()
+        lastLine = min(firstLine + self._visibleLineCount() + 1, self._lineIndex.lineCount())
+        offset = self._lineIndex.lineOffset(firstLine)
+        for row, lineNumber in enumerate(range(firstLine, lastLine)):
+            end = self._mm.find(b'\n', offset)
+            if end == -1:
+                end = len(self._mm)
+            text = self._lineText(offset, end)
+            y = row * lineHeight
+
+            if self._match is not None and self._match[0] == lineNumber and \
+               self._match[1] < offset + _MAX_LINE_LENGTH:  # the match is in the shown part of the line
+                matchStart, matchEnd = self._match[1:]
+                matchEnd = min(matchEnd, offset + _MAX_LINE_LENGTH)
+                matchX = metrics.width(self._lineText(offset, matchStart))
+                matchWidth = metrics.width(self._lineText(matchStart, matchEnd))
+                painter.fillRect(QRect(xOffset + matchX, y, matchWidth, lineHeight),
+                                 self.palette().color(QPalette.Highlight))
+
+            painter.drawText(xOffset, y + metrics.ascent(), text)
+            self._maxLineWidth = max(self._maxLineWidth, metrics.width(text))
+
+            offset = end + 1
+            if offset > len(self._mm):
+                break
+
+        self.horizontalScrollBar().setRange(0, max(0, self._maxLineWidth - self.viewport().width()))
+
+
+class LargeFileViewer(QWidget):
+    """Read-only viewer window. Raises ``OSError``, if failed to map the file
+    """
+
+    closed = pyqtSignal()
+
+    def __init__(self, parent, filePath):
+        QWidget.__init__(self, parent, Qt.Window)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle('{} (read only)'.format(filePath))
+        self._filePath = filePath
+
+        with open(filePath, 'rb') as file_:
+            self._mm = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._lineIndex = LineIndex(self._mm)
+        self._indexerThread = _IndexerThread(self._lineIndex)
+        self._searchThread = None
+        self._searchOffset = 0
+
+        self._view = _LargeFileView(self, self._mm, self._lineIndex)
+        self._searchEdit = QLineEdit(self)
+        self._searchEdit.setPlaceholderText('Search')
+        self._searchEdit.returnPressed.connect(self._onFindNext)
+        findNextButton = QPushButton('Find &next', self)
+        findNextButton.clicked.connect(self._onFindNext)
+        goToButton = QPushButton('&Go to line', self)
+        goToButton.clicked.connect(self._onGoTo)
+        self._statusLabel = QLabel(self)
+
+        toolLayout = QHBoxLayout()
+        toolLayout.addWidget(self._searchEdit)
+        toolLayout.addWidget(findNextButton)
+        toolLayout.addWidget(goToButton)
+        toolLayout.addWidget(self._statusLabel)
+        layout = QVBoxLayout(self)
+        layout.addLayout(toolLayout)
+        layout.addWidget(self._view)
+
+        self._statusTimer = QTimer(self)
+        self._statusTimer.setInterval(_INDEX_STATUS_UPDATE_MS)
+        self._statusTimer.timeout.connect(self._updateIndexStatus)
+        self._statusTimer.start()
+        self._indexerThread.start(QThread.LowPriority)
+
+        self.resize(parent.size() if parent is not None else self.size())
+
+    def filePath(self):
+        return self._filePath
+
+    def closeEvent(self, event):
+        self._stopSearch()
+        self._lineIndex.stop()
+        self._indexerThread.wait()
+        self._statusTimer.stop()
+        self._view.hide()
+        self._mm.close()
+        self.closed.emit()
+        QWidget.closeEvent(self, event)
+
+    def _updateIndexStatus(self):
+        self._view.updateScrollBars()
+        self._view.viewport().update()
+        if self._lineIndex.isComplete():
+            self._statusTimer.stop()
+            self._statusLabel.setText('{} lines'.format(self._lineIndex.lineCount()))
+        else:
+            self._statusLabel.setText('Indexing lines: {}%'.format(self._lineIndex.progress()))
+
+    def _onGoTo(self):
+        lineCount = self._lineIndex.lineCount()
+        line, accepted = QInputDialog.getInt(self, "Go To Line...", "Enter the line you want to go to:",
+                                             self._view.verticalScrollBar().value() + 1, 1, lineCount, 1)
+        if accepted:
+            self._view.scrollToLine(line - 1)
+
+    def _stopSearch(self):
+        if self._searchThread is not None:
+            self._searchThread.stop()
+            self._searchThread.wait()
+            self._searchThread = None
+
+    def _onFindNext(self):
+        pattern = self._searchEdit.text().encode('utf8')
+        if not pattern:
+            return
+
+        self._stopSearch()
+        self._statusLabel.setText('Searching...')
+        self._searchThread = _SearchThread(self._mm, self._lineIndex, pattern, self._searchOffset)
+        self._searchThread.found.connect(lambda offset, line: self._onFound(offset, line, len(pattern)))
+        self._searchThread.notFound.connect(lambda: self._statusLabel.setText('Not found'))
+        self._searchThread.start()
+
+    def _onFound(self, offset, lineNumber, length):
+        self._searchOffset = offset + 1
+        self._statusLabel.setText('Line {}'.format(lineNumber + 1))
+        self._view.setMatch(lineNumber, offset, offset + length)
@@ -8,6 +8,8 @@ Contains definition of AbstractCommand and AbstractCompleter interfaces
 """
 
 import os
+import time
+from collections import OrderedDict
 
 from PyQt5.QtCore import pyqtSignal, QAbstractItemModel, QEvent, QModelIndex, QObject, Qt, QTimer
 from PyQt5.QtWidgets import QDialog, QLineEdit, QTreeView, QVBoxLayout
@@ -17,7 +19,7 @@ from threading import Thread, Event
 from queue import Queue
 
 from enki.core.core import core
-from enki.lib.htmldelegate import HTMLDelegate
+from enki.lib.htmldelegate import HighlightDelegate, HIGHLIGHTED_TEXT_ROLE
 
 
 class InvalidCmdArgs(UserWarning):
@@ -68,6 +70,16 @@ class AbstractCommand(QObject):
         """
         pass
 
+    def onDialogShown(self):
+        """Locator dialog has been shown again.
+
+        Command instances are reused while Enki is running.
+        Reset the state, which belongs to the previous invocation, here.
+
+        Default implementation does nothing
+        """
+        pass
+
     @staticmethod
     def isAvailable():
         """Check if command is available now.
@@ -119,7 +131,9 @@ class AbstractCommand(QObject):
     def isReadyToExecute(self):
         """Check if command is ready to execute.
 
-        It is ready, when it is complete (contains all mandatory arguments) and arguments are valid
+        It is ready, when it is complete (contains all mandatory arguments) and arguments are valid.
+        If the user tries to execute the command while its completer is being loaded,
+        the method is called again after ``onCompleterLoaded()``
         """
         return True
 
@@ -140,8 +154,15 @@ class AbstractCompleter:
     * list of possible completions
 
     If ``mustBeLoaded`` class attribute is True, ``load()`` method will be called in a thread.
+
+    Loaded completers can be cached by the Locator and shown again without loading,
+    i.e. when the user deletes the last typed character. See ``cacheKey()``
+
+    Slowly loading completers can show found rows before ``load()`` has finished.
+    See ``publishPartialResult()``
     """
     mustBeLoaded = False
+    _partialResultCallback = None
 
     def terminate(self):
         """Terminate the completer if necessary.
@@ -157,6 +178,41 @@ class AbstractCompleter:
         """
         pass
 
+    def setPartialResultCallback(self, callback):
+        """Set function, which receives partial results. Called by the Locator before ``load()``
+        """
+        self._partialResultCallback = callback
+
+    def publishPartialResult(self, makePartialCompleter):
+        """Show rows, which have been found so far. Call it from ``load()`` as often as you like.
+
+        ``makePartialCompleter`` is a function without arguments, which returns a new completer instance
+        with the data found so far. The instance must not be changed by ``load()`` later.
+        The function is called only when the Locator is going to update the view,
+        not more often than every 100 ms
+        """
+        if self._partialResultCallback is not None:
+            self._partialResultCallback(makePartialCompleter)
+
+    def cacheKey(self):
+        """Key for caching of the loaded completer.
+
+        The key must describe everything the loaded data depends on: the arguments and
+        the data generation, i.e. version of project files or directory modification time.
+        It must be hashable and must not change in ``load()``.
+        Command class is added to the key by the Locator.
+
+        Default implementation returns ``None``, the completer is not cached
+        """
+        return None
+
+    def isUpToDate(self):
+        """Check if cached completer is still valid. Called in the GUI thread before showing cached completer.
+
+        Default implementation returns ``True``
+        """
+        return True
+
     def rowCount(self):
         """Row count for TreeView
         """
@@ -172,6 +228,17 @@ class AbstractCompleter:
         """
         raise NotImplemented()
 
+    def highlightedText(self, row, column):
+        """Plain text with highlighted parts for TreeView item.
+
+        Return list of lines ``(text, [(start, length), ...])``.
+        The first line is drawn with the normal font, the next lines are smaller.
+        Drawing such items is much faster than HTML from ``text()``.
+
+        Default implementation returns None, ``text()`` is used
+        """
+        return None
+
     def icon(self, row, column):
         """Icon for TreeView item. Default is None
         """
@@ -305,7 +372,12 @@ class _CompleterModel(QAbstractItemModel):
         if self.completer is None:
             return None
         if role == Qt.DisplayRole:
+            lines = self.completer.highlightedText(index.row(), index.column())
+            if lines is not None:
+                return '\n'.join([text for text, ranges in lines])
             return self.completer.text(index.row(), index.column())
+        elif role == HIGHLIGHTED_TEXT_ROLE:
+            return self.completer.highlightedText(index.row(), index.column())
         elif role == Qt.DecorationRole:
             return self.completer.icon(index.row(), index.column())
         return None
@@ -323,6 +395,79 @@ class _CompleterModel(QAbstractItemModel):
         self.completer = completer
         self.modelReset.emit()
 
+    def updateCompleter(self, completer):
+        """Set completer, which contains more data, than the current one.
+        Rows are appended to the view without resetting it. Existing rows are updated
+        """
+        oldRowCount = self.rowCount()
+        newRowCount = completer.rowCount()
+        if newRowCount < oldRowCount or \
+           completer.columnCount() != self.completer.columnCount():
+            self.setCompleter(completer)
+            return
+
+        if newRowCount > oldRowCount:
+            self.beginInsertRows(QModelIndex(), oldRowCount, newRowCount - 1)
+            self.completer = completer
+            self.endInsertRows()
+        else:
+            self.completer = completer
+
+        if oldRowCount:
+            self.dataChanged.emit(self.createIndex(0, 0),
+                                  self.createIndex(oldRowCount - 1, completer.columnCount() - 1))
+
+
+class _CompleterCache:
+    """LRU cache of loaded completers.
+
+    Key is ``(command class, completer.cacheKey())``
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._completers = OrderedDict()
+
+    @staticmethod
+    def _key(command, completer):
+        completerKey = completer.cacheKey()
+        if completerKey is None:
+            return None
+        return (type(command), completerKey)
+
+    def get(self, command, completer):
+        """Get cached completer with the same key, or None
+        """
+        key = self._key(command, completer)
+        if key is None:
+            return None
+
+        cached = self._completers.get(key)
+        if cached is None:
+            return None
+
+        if not cached.isUpToDate():
+            del self._completers[key]
+            return None
+
+        self._completers.move_to_end(key)
+        return cached
+
+    def put(self, command, completer):
+        """Put loaded completer to the cache. Drop the least recently used, if full
+        """
+        key = self._key(command, completer)
+        if key is None:
+            return
+
+        self._completers[key] = completer
+        self._completers.move_to_end(key)
+        while len(self._completers) > self._size:
+            self._completers.popitem(last=False)
+
+    def clear(self):
+        self._completers.clear()
+
 
 class _CompletableLineEdit(QLineEdit):
     """Locator line edit.
@@ -424,6 +569,13 @@ class _CompletableLineEdit(QLineEdit):
         self.terminate()
         self._inlineCompletionIsSet = False
 
+    def clearText(self):
+        """Clear the text and inline completion
+        """
+        self.terminate()
+        self._inlineCompletionIsSet = False
+        self.clear()
+
     def _clearInlineCompletion(self):
         """Clear inline completion, if exists
         """
@@ -466,76 +618,99 @@ class _CompletableLineEdit(QLineEdit):
         return text
 
 
+class _LoaderNotifier(QObject):
+    """Delivers loaded completers from _CompleterLoaderThread to the GUI thread.
+
+    The object lives in the GUI thread, signal emitted by the loader thread is queued
+    """
+    loaded = pyqtSignal(int, object, object)  # task ID, command, completer
+    partialLoaded = pyqtSignal(int, object, object)  # task ID, command, partial completer
+
+
 class _CompleterLoaderThread(Thread):
     """Thread constructs Completer
     Sometimes it requires a lot of time, i.e. when expanding "/usr/lib/*"
     hlamer: I tried to use QThread + pyqtSignal, but got tired with crashes and deadlocks
+
+    Loaded completers are posted to the GUI thread with a queued signal.
+    The GUI thread never waits for the thread. Every task has own stop event,
+    starting a new task sets the stop event of the previous one.
+    Results of outdated tasks are ignored
     """
     daemon = True
 
+    _PARTIAL_RESULT_INTERVAL_SEC = 0.1
+
     def __init__(self, locator):
         """Works in the GUI thread
         """
         Thread.__init__(self)
 
         self._locator = locator
+        self._terminated = False
 
-        self._taskQueue = Queue()  # completer or None as exit signal
-        self._resultQueue = Queue()
+        self._taskQueue = Queue()  # (task ID, command, completer, stop event) or None as exit signal
 
-        self._checkResultQueueTimer = QTimer()
-        self._checkResultQueueTimer.setInterval(50)
-        self._checkResultQueueTimer.timeout.connect(self._checkResultQueue)
-        self._checkResultQueueTimer.start()
+        self._notifier = _LoaderNotifier()
+        self._notifier.loaded.connect(self._onLoaded)
+        self._notifier.partialLoaded.connect(self._onPartialLoaded)
 
+        self._taskId = 0
         self._stopEvent = Event()
         Thread.start(self)
 
-    def _checkResultQueue(self):
-        """Check if thread constructed a completer and put it to the queue
+    def _onLoaded(self, taskId, command, completer):
+        """Thread constructed a completer
         Works in the GUI thread
         """
-        if not self._resultQueue.empty():
-            command, completer = self._resultQueue.get()
+        if not self._terminated and taskId == self._taskId:
             self._locator.onCompleterLoaded(command, completer)
 
+    def _onPartialLoaded(self, taskId, command, completer):
+        """Thread published partial result
+        Works in the GUI thread
+        """
+        if not self._terminated and taskId == self._taskId:
+            self._locator.onPartialCompleterLoaded(command, completer)
+
     def loadCompleter(self, command, completer):
         """Start constructing completer
         Works in the GUI thread
         """
         # Stop previous
         self._stopEvent.set()
-        self._taskQueue.join()
-
-        # Drop previous result
-        while not self._resultQueue.empty():
-            self._resultQueue.get()
 
         # Start new
-        self._stopEvent.clear()
-        task = (command, completer)
+        self._stopEvent = Event()
+        self._taskId += 1
         if not self.is_alive():
             assert 0
-        self._taskQueue.put(task)
+        self._taskQueue.put((self._taskId, command, completer, self._stopEvent))
+
+    def cancel(self):
+        """Stop loading current completer and ignore its result
+        Works in the GUI thread
+        """
+        self._stopEvent.set()
+        self._taskId += 1
 
     def terminate(self):
         """Set termination flag
-        Works in the GUI thread
+        Works in the GUI thread. Doesn't wait for the thread
         """
-        if self.is_alive():
+        if not self._terminated:
+            self._terminated = True
             self._stopEvent.set()
             self._taskQueue.put(None)
-            self._checkResultQueueTimer.stop()
-            self.join()
 
     def _getNextTask(self):
         # discard old commands
-        while self._taskQueue.qsize() > 1:
-            self._taskQueue.get()
-            self._taskQueue.task_done()
+        task = self._taskQueue.get()
+        while task is not None and not self._taskQueue.empty():
+            task = self._taskQueue.get()
 
         # Get the last command
-        return self._taskQueue.get()
+        return task
 
     def run(self):
         """Thread function
@@ -543,16 +718,33 @@ class _CompleterLoaderThread(Thread):
         """
         while True:
             task = self._getNextTask()
-            try:
-                if task is None:  # exit command
-                    break
+            if task is None:  # exit command
+                break
+
+            taskId, command, completer, stopEvent = task
+            if stopEvent.is_set():
+                continue
 
-                command, completer = task
-                completer.load(self._stopEvent)
-                if self._taskQueue.empty():
-                    self._resultQueue.put((command, completer))
-            finally:
-                self._taskQueue.task_done()
+            completer.setPartialResultCallback(self._makePartialResultCallback(taskId, command, stopEvent))
+            completer.load(stopEvent)
+            completer.setPartialResultCallback(None)
+            if not stopEvent.is_set():
+                self._notifier.loaded.emit(taskId, command, completer)
+
+    def _makePartialResultCallback(self, taskId, command, stopEvent):
+        """Make function, which posts partial results of the task to the GUI thread, but not too often
+        Works in NEW thread
+        """
+        lastTime = [time.time()]
+
+        def callback(makePartialCompleter):
+            now = time.time()
+            if now - lastTime[0] >= self._PARTIAL_RESULT_INTERVAL_SEC and \
+               not stopEvent.is_set():
+                lastTime[0] = now
+                self._notifier.partialLoaded.emit(taskId, command, makePartialCompleter())
+
+        return callback
 
 
 def splitLine(text):
@@ -615,14 +807,34 @@ class Locator(QObject):
         self._action.triggered.connect(self._onAction)
         self._separator = core.actionManager().menu("mNavigation").addSeparator()
 
+        self._dialog = None
+
+        # The dialog is created once, when the main loop is idle, and reused.
+        # Then Ctrl+L shows it without delay
+        self._createDialogTimer = QTimer(self)
+        self._createDialogTimer.setSingleShot(True)
+        self._createDialogTimer.setInterval(0)
+        self._createDialogTimer.timeout.connect(self._createDialog)
+        self._createDialogTimer.start()
+
     def terminate(self):
+        self._createDialogTimer.stop()
+        if self._dialog is not None:
+            self._dialog.terminate()
+            self._dialog.deleteLater()
+            self._dialog = None
         core.actionManager().removeAction(self._action)
         core.actionManager().menu("mNavigation").removeAction(self._separator)
 
+    def _createDialog(self):
+        if self._dialog is None:
+            self._dialog = _LocatorDialog(core.mainWindow())
+
     def _onAction(self):
         """Locator action triggered. Show themselves and make focused
         """
-        _LocatorDialog(core.mainWindow(), self._availableCommands()).exec_()
+        self._createDialog()
+        self._dialog.execWithCommands(self._availableCommands())
 
     def addCommandClass(self, commandClass):
         """Add new command to the locator. Shall be called by plugins, which provide locator commands
@@ -633,6 +845,8 @@ class Locator(QObject):
         """Remove command from the locator. Shall be called by plugins when terminating it
         """
         self._commandClasses.remove(commandClass)
+        if self._dialog is not None:
+            self._dialog.removeCommandClass(commandClass)
 
     def _availableCommands(self):
         """Get list of available commands
@@ -642,12 +856,18 @@ class Locator(QObject):
 
 class _LocatorDialog(QDialog):
     """Locator widget and implementation
+
+    The dialog lives as long as the Locator. It is shown with ``execWithCommands()`` and hidden when finished.
+    Command instances, the loader thread and loaded data are kept between invocations
     """
 
-    def __init__(self, parent, commandClasses):
+    _COMPLETER_CACHE_SIZE = 32
+
+    def __init__(self, parent):
         QDialog.__init__(self, parent)
         self._terminated = False
-        self._commandClasses = commandClasses
+        self._commandClasses = []
+        self._commands = {}  # command class: command instance
 
         self._createUi()
 
@@ -657,15 +877,40 @@ class _LocatorDialog(QDialog):
         self._loadingTimer.timeout.connect(self._applyLoadingCompleter)
 
         self._completerLoaderThread = _CompleterLoaderThread(self)
+        self._completerCache = _CompleterCache(self._COMPLETER_CACHE_SIZE)
 
-        self.finished.connect(self._terminate)
+        self.finished.connect(self._onFinished)
 
         self._command = None
-        self._updateCurrentCommand()
+        self._showingPartialCompleter = False
+        self._loadingCommand = None  # command, which completer is being loaded
+        self._executeWhenLoaded = False  # Enter has been pressed while loading
 
-    def _createUi(self):
+    def execWithCommands(self, commandClasses):
+        """Show the dialog with clear line edit and run its event loop
+        """
+        self._commandClasses = commandClasses
         self.setWindowTitle(core.project().path().replace(os.sep, '/') or 'Locator')
 
+        for command in self._commands.values():
+            command.onDialogShown()
+
+        self._edit.clearText()
+        self._updateCurrentCommand()
+        self._edit.setFocus()
+        return self.exec_()
+
+    def removeCommandClass(self, commandClass):
+        """Command class has been removed from the Locator. Terminate its instance
+        """
+        command = self._commands.pop(commandClass, None)
+        if command is not None:
+            if command is self._command:
+                self._command.updateCompleter.disconnect(self._updateCompletion)
+                self._command = None
+            command.terminate()
+
+    def _createUi(self):
         self.setLayout(QVBoxLayout())
         self.layout().setContentsMargins(0, 0, 0, 0)
         self.layout().setSpacing(1)
@@ -686,7 +931,7 @@ class _LocatorDialog(QDialog):
         self._table.setFont(biggerFont)
         self._model = _CompleterModel()
         self._table.setModel(self._model)
-        self._table.setItemDelegate(HTMLDelegate(self._table))
+        self._table.setItemDelegate(HighlightDelegate(self._table))
         self._table.setRootIsDecorated(False)
         self._table.setHeaderHidden(True)
         self._table.clicked.connect(self._onItemClicked)
@@ -697,19 +942,36 @@ class _LocatorDialog(QDialog):
         width = QFontMetrics(self.font()).width('x' * 64)  # width of 64 'x' letters
         self.resize(width, width * 0.62)
 
-    def _terminate(self):
+    def _onFinished(self):
+        """Dialog has been closed. It will be shown again later
+        """
+        self._edit.terminate()
+        self._loadingTimer.stop()
+        self._completerLoaderThread.cancel()  # results are not needed for the hidden dialog
+        self._loadingCommand = None
+        self._executeWhenLoaded = False
+        core.workspace().focusCurrentDocument()
+
+    def terminate(self):
+        """Terminate commands and the loader thread. Called when Enki is terminating
+        """
         if not self._terminated:
+            self._terminated = True
             if self._command is not None:
-                self._command.terminate()
+                self._command.updateCompleter.disconnect(self._updateCompletion)
                 self._command = None
 
+            for command in self._commands.values():
+                command.terminate()
+            self._commands = {}
+
             self._edit.terminate()
+            self._loadingTimer.stop()
 
             self._completerLoaderThread.terminate()
+            self._completerCache.clear()
             if self._model:
                 self._model.terminate()
-            core.workspace().focusCurrentDocument()
-            self._terminated = True
 
     def _updateCurrentCommand(self):
         """Try to parse line edit text and set current command
@@ -722,7 +984,6 @@ class _LocatorDialog(QDialog):
         if newCommand is not self._command:
             if self._command is not None:
                 self._command.updateCompleter.disconnect(self._updateCompletion)
-                self._command.terminate()
 
             self._command = newCommand
             if self._command is not None:
@@ -733,12 +994,22 @@ class _LocatorDialog(QDialog):
     def _updateCompletion(self):
         """User edited text or moved cursor. Update inline and TreeView completion
         """
+        self._loadingCommand = None
+        self._executeWhenLoaded = False  # the text has changed
+
         if self._command is not None:
             completer = self._command.completer()
 
             if completer is not None and completer.mustBeLoaded:
-                self._loadingTimer.start()
-                self._completerLoaderThread.loadCompleter(self._command, completer)
+                cached = self._completerCache.get(self._command, completer)
+                if cached is not None:
+                    self._completerLoaderThread.cancel()
+                    self._applyCompleter(self._command, cached)
+                else:
+                    self._loadingTimer.start()
+                    self._showingPartialCompleter = False  # partial result of the previous task is outdated
+                    self._loadingCommand = self._command
+                    self._completerLoaderThread.loadCompleter(self._command, completer)
             else:
                 self._applyCompleter(self._command, completer)
         else:
@@ -753,13 +1024,42 @@ class _LocatorDialog(QDialog):
         """The method called from _CompleterLoaderThread when the completer is ready
         This code works in the GUI thread
         """
+        self._completerCache.put(command, completer)
+        self._loadingCommand = None
         self._applyCompleter(command, completer)
 
+        if self._executeWhenLoaded and command is self._command:
+            self._executeWhenLoaded = False
+            self._tryExecCurrentCommand()
+
+    def onPartialCompleterLoaded(self, command, completer):
+        """The method called from _CompleterLoaderThread when the completer has published partial result
+        This code works in the GUI thread
+        """
+        self._loadingTimer.stop()
+
+        if self._showingPartialCompleter:
+            self._model.updateCompleter(completer)
+        else:
+            self._model.setCompleter(completer)
+            self._showingPartialCompleter = True
+            self._autoSelectItem(completer)
+
+    def _autoSelectItem(self, completer):
+        selItem = completer.autoSelectItem()
+        if selItem:
+            index = self._model.createIndex(selItem[0],
+                                            selItem[1])
+            self._table.setCurrentIndex(index)
+
     def _applyCompleter(self, command, completer):
         """Apply completer. Called by _updateCompletion or by thread function when Completer is constructed
         """
         self._loadingTimer.stop()
 
+        replacesPartialCompleter = self._showingPartialCompleter and command is not None
+        self._showingPartialCompleter = False
+
         if command is not None:
             command.onCompleterLoaded(completer)
 
@@ -769,16 +1069,17 @@ class _LocatorDialog(QDialog):
         if self._edit.cursorPosition() == len(self._edit.text()):  # if cursor at the end of text
             self._edit.setInlineCompletion(completer.inline())
 
-        self._model.setCompleter(completer)
+        if replacesPartialCompleter:
+            self._model.updateCompleter(completer)
+        else:
+            self._model.setCompleter(completer)
         if completer.columnCount() > 1:
             self._table.resizeColumnToContents(0)
             self._table.setColumnWidth(0, self._table.columnWidth(0) + 20)  # 20 px spacing between columns
 
-        selItem = completer.autoSelectItem()
-        if selItem:
-            index = self._model.createIndex(selItem[0],
-                                            selItem[1])
-            self._table.setCurrentIndex(index)
+        # Do not move selection, if the user has selected an item while the completer was loading
+        if not (replacesPartialCompleter and self._table.currentIndex().isValid()):
+            self._autoSelectItem(completer)
 
     def _onItemClicked(self, index):
         """Item in the TreeView has been clicked.
@@ -811,6 +1112,9 @@ class _LocatorDialog(QDialog):
             self.accept()
             return True
         else:
+            if self._command is not None and self._command is self._loadingCommand:
+                # The command might become ready, when the completer is loaded
+                self._executeWhenLoaded = True
             return False
 
     def _chooseCommand(self, words):
@@ -852,10 +1156,10 @@ class _LocatorDialog(QDialog):
         # Find command
         cmdClass, args = self._chooseCommand(words)
 
-        if isinstance(self._command, cmdClass):
-            command = self._command
-        else:
+        command = self._commands.get(cmdClass)
+        if command is None:
             command = cmdClass()
+            self._commands[cmdClass] = command
 
         # Try to make command object
         try:
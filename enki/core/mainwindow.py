@@ -10,6 +10,7 @@ import sys
 import os.path
 import platform
 
+import sip
 from PyQt5.QtCore import pyqtSignal, QSize, Qt, QTimer, pyqtSlot
 from PyQt5.QtGui import QIcon, QPalette
 from PyQt5.QtWidgets import QApplication, QLabel, QMessageBox, QMainWindow, \
@@ -108,6 +109,7 @@ class MainWindow(QMainWindow):
         self._createdActions = []
 
         self._addedDockWidgets = []
+        self._unpinnedDockWidgets = []  # closed, when a document gets focus
 
         if hasattr(self, 'setUnifiedTitleAndToolBarOnMac'):  # missing on some PyQt5 versions
             self.setUnifiedTitleAndToolBarOnMac(True)
@@ -490,6 +492,9 @@ class MainWindow(QMainWindow):
         """
         assert not dock in self._addedDockWidgets
         self._addedDockWidgets.append(dock)
+        dock.pinnedChanged.connect(self._updateUnpinnedDockWidgets)
+        dock.destroyed.connect(self._onDockWidgetDestroyed)
+        self._updateUnpinnedDockWidgets()
 
         if not self.restoreDockWidget(dock):
             QMainWindow.addDockWidget(self, area, dock)
@@ -513,8 +518,27 @@ class MainWindow(QMainWindow):
         """Remove dock widget"""
         assert dock in self._addedDockWidgets
         self._addedDockWidgets.remove(dock)
+        dock.pinnedChanged.disconnect(self._updateUnpinnedDockWidgets)
+        dock.destroyed.disconnect(self._onDockWidgetDestroyed)
+        self._updateUnpinnedDockWidgets()
         QMainWindow.removeDockWidget(self, dock)
 
+    def _onDockWidgetDestroyed(self):
+        """Dock has been deleted without removeDockWidget() call
+        """
+        self._addedDockWidgets = [dock for dock in self._addedDockWidgets if not sip.isdeleted(dock)]
+        self._unpinnedDockWidgets = [dock for dock in self._unpinnedDockWidgets if not sip.isdeleted(dock)]
+
+    def _updateUnpinnedDockWidgets(self):
+        self._unpinnedDockWidgets = [dock for dock in self._addedDockWidgets
+                                     if not dock.isPinned()]
+
+    def unpinnedDockWidgets(self):
+        pass  # not a plugin API method
+        """Added dock widgets, which are not pinned. The list is cached, it is cheap to call the method often
+        """
+        return self._unpinnedDockWidgets
+
     def restoreState(self, state):
         pass  # not a plugin API method
         """Restore state shows widgets, which exist
@@ -51,6 +51,7 @@ class _OpenedFileModel(QAbstractItemModel):
         self._workspace.documentOpened.connect(self._onDocumentOpened)
         self._workspace.documentClosed.connect(self._onDocumentClosed)
         self._workspace.modificationChanged.connect(self._onDocumentDataChanged)
+        self._workspace.documentsExternallyChanged.connect(self._onDocumentsExternallyChanged)
         self._MRU = False
 
     def columnCount(self, parent):  # pylint: disable=W0613
@@ -339,6 +340,12 @@ class _OpenedFileModel(QAbstractItemModel):
         index = self.documentIndex(document_)
         self.dataChanged.emit(index, index)
 
+    def _onDocumentsExternallyChanged(self, documents):
+        """Files of the documents have been modified or removed. Update views once
+        """
+        rows = [self._workspace.sortedDocuments.index(document) for document in documents]
+        self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), 0))
+
     @pyqtSlot(Document)
     def _onDocumentClosed(self, document):
         """Document has been closed. Unhandle it
@@ -30,7 +30,7 @@ class _ScannerThread(QThread):
     def run(self):
         results = []
 
-        filterRe = core.fileFilter().regExp()
+        fileMatcher = core.fileFilter().matcher()
 
         basename = os.path.basename(self._path)
         lastUpdateTime = time.time()
@@ -43,11 +43,11 @@ class _ScannerThread(QThread):
 
             # remove not interesting directories
             for dirname in dirnames[:]:
-                if filterRe.match(dirname):
+                if fileMatcher.isIgnored(dirname):
                     dirnames.remove(dirname)
 
             for filename in filenames:
-                if not filterRe.match(filename):
+                if not fileMatcher.isIgnored(filename):
                     results.append(os.path.relpath(os.path.join(root, filename), self._path))
             if time.time() - lastUpdateTime > STATUS_UPDATE_TIMEOUT_SEC:
                 self.status.emit('Scanning {}: {} files found'.format(basename, len(results)))
@@ -88,6 +88,7 @@ class Project(QObject):
         QObject.__init__(self, core)
         self._path = None
         self._projectFiles = None
+        self._filesVersion = 0
         self._thread = None
         self._scanStatus = None
         self._core = core
@@ -143,6 +144,13 @@ class Project(QObject):
         """
         return self._projectFiles
 
+    def filesVersion(self):
+        """Version of the list of project files.
+
+        Incremented every time the list is loaded. Allows to cache data, calculated from the list
+        """
+        return self._filesVersion
+
     def startLoadingFiles(self):
         """Start asyncronous loading project files.
 
@@ -172,11 +180,9 @@ class Project(QObject):
         Report progress to status bar.
         It is allowed to call this method multiple times.
         """
-        if self._thread is not None:
-            return
-
         self._backgroundScan = True
-        self._startScannerThread()
+        if self._thread is None:
+            self._startScannerThread()
 
     def isScanning(self):
         return self._thread is not None
@@ -191,6 +197,7 @@ class Project(QObject):
     @pyqtSlot(str, list)
     def _onFilesReady(self, path, files):
         self._projectFiles = files
+        self._filesVersion += 1
         self._backgroundScan = False
         self._stopScannerThread()
         self.filesReady.emit()
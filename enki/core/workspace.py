@@ -20,15 +20,20 @@ from PyQt5.QtWidgets import QAction, QApplication, QDialog, QDialogButtonBox, \
     QListWidgetItem, QMessageBox, QStackedWidget, QShortcut, QAbstractButton
 from PyQt5.QtGui import QKeySequence, QIcon
 
-from PyQt5.QtCore import pyqtSignal, pyqtSlot, QEvent, Qt  # pylint: disable=E0611
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QEvent, QObject, QTimer, Qt  # pylint: disable=E0611
 from PyQt5 import uic
 
 from enki.core.core import core, DATA_FILES_PATH
 import enki.core.openedfilemodel
 from enki.core.document import Document
+from enki.core.filewatcher import FileWatcher
+from enki.core.largefile import LargeFileViewer
+from enki.lib.future import AsyncController
 
 
-_MAX_SUPPORTED_FILE_SIZE = 50 * 1000 * 1000  # Enki may freeze or crash if file is too big
+_MAX_SUPPORTED_FILE_SIZE = 50 * 1000 * 1000  # Bigger files are opened in the read-only viewer
+_BACKGROUND_LOADING_MIN_SIZE = 1000 * 1000  # Smaller files are loaded immediately by openFile()
+_DEFERRED_LOADING_INTERVAL_MS = 100  # Deferred documents are loaded one by one in idle time
 
 
 class _UISaveFiles(QDialog):
@@ -111,6 +116,37 @@ class _UISaveFiles(QDialog):
             assert 0
 
 
+class _DocumentFocusFilter(QObject):
+    """Application event filter. Closes unpinned docks, when a document gets focus.
+
+    A single filter serves all documents, the cost of an event doesn't depend on count of opened documents.
+    ``focusInEvent()`` of the document can't be used, because the editor is the focus proxy
+    """
+
+    def __init__(self, workspace):
+        QObject.__init__(self, workspace)
+        QApplication.instance().installEventFilter(self)
+
+    def terminate(self):
+        QApplication.instance().removeEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.FocusIn:
+            document = obj if isinstance(obj, Document) else obj.parent()
+            if isinstance(document, Document) and \
+               (obj is document or obj is document.focusProxy()):
+                self._closeUnpinnedDocks()
+
+        return False
+
+    def _closeUnpinnedDocks(self):
+        for dock in core.mainWindow().unpinnedDockWidgets()[:]:
+            # The exception: if the Open Files dock is waiting for the Ctrl button to be released,
+            # keep it open; it will be be closed when Ctrl is released.
+            if not getattr(dock, '_waitForCtrlRelease', False):
+                dock._close()
+
+
 class Workspace(QStackedWidget):
     """
     Class manages set of opened documents, allows to open new file
@@ -147,6 +183,15 @@ class Workspace(QStackedWidget):
     new document opened, current closed
     """  # pylint: disable=W0105
 
+    documentsExternallyChanged = pyqtSignal(list)
+    """
+    documentsExternallyChanged([documents])
+
+    **Signal** emitted, when files of the documents have been modified or removed externally,
+    or restored. Notifications are collected, one signal is emitted for many files.
+    See ``isExternallyModified()`` and ``isExternallyRemoved()`` of the document
+    """  # pylint: disable=W0105
+
     modificationChanged = pyqtSignal(Document, bool)
     """
     modificationChanged(document, modified)
@@ -273,6 +318,15 @@ class Workspace(QStackedWidget):
         self.sortedDocuments = []  # not protected, because available for OpenedFileModel
         self._oldCurrentDocument = None
 
+        self._loader = AsyncController(2)  # loads documents in the background
+        self._deferredLoadingTimer = QTimer(self)
+        self._deferredLoadingTimer.setInterval(_DEFERRED_LOADING_INTERVAL_MS)
+        self._deferredLoadingTimer.timeout.connect(self._loadNextDeferredDocument)
+        self._largeFileViewers = []
+        self._focusFilter = _DocumentFocusFilter(self)
+        self._fileWatcher = FileWatcher(self)
+        self._fileWatcher.documentsChanged.connect(self.documentsExternallyChanged)
+
         # create opened files explorer
         # openedFileExplorer is not protected, because it is available for OpenedFileModel
         self.openedFileExplorer = enki.core.openedfilemodel.OpenedFileExplorer(self)
@@ -287,7 +341,13 @@ class Workspace(QStackedWidget):
     def terminate(self):
         """Terminate workspace. Called by the core to clear actions
         """
+        self._focusFilter.terminate()
+        self._deferredLoadingTimer.stop()
         self.forceCloseAllDocuments()
+        for viewer in self._largeFileViewers[:]:
+            viewer.close()
+        self._loader.terminate()
+        self._fileWatcher.terminate()
         self.openedFileExplorer.terminate()
         core.project().changed.disconnect(self._updateMainWindowTitle)
 
@@ -372,6 +432,7 @@ class Workspace(QStackedWidget):
 
         if document is not None:
             self.setFocusProxy(document)
+            document.startLoading()
 
         self.currentDocumentChanged.emit(self._oldCurrentDocument, document)
         self._oldCurrentDocument = document
@@ -455,6 +516,12 @@ class Workspace(QStackedWidget):
         if document is None:
             return
 
+        try:
+            document.waitForLoaded()
+        except (OSError, IOError) as ex:
+            QMessageBox.critical(self._mainWindow(), "Failed to open the file", str(ex))
+            return
+
         if line is not None:
             assert absPos is None
             if line >= len(document.qutepart.lines):
@@ -522,9 +589,12 @@ class Workspace(QStackedWidget):
         else:  # os.path.samefile not available
             return os.path.normpath(pathA) == os.path.normpath(pathB)
 
-    def _openSingleFile(self, filePath):
+    def _openSingleFile(self, filePath, inBackground, deferLoading=False):
         """Open 1 file.
         Helper method, used by openFile() and openFiles()
+
+        If ``inBackground`` is set, the file is read and decoded in the background,
+        otherwise only big files are. If ``deferLoading`` is set, the file is not loaded until activated
         """
         # Close 'untitled'
         if len(self.documents()) == 1 and \
@@ -556,14 +626,9 @@ class Workspace(QStackedWidget):
                                  "{} is a directory".format(filePath))
             return None
 
-        # Check if too big
+        # Check if too big. Show it in the read-only viewer
         if statInfo.st_size > _MAX_SUPPORTED_FILE_SIZE:
-            msg = ("<html>" +
-                   "{} file size is {}.<br/>" +
-                   "I am a text editor, but not a data dump editor. " +
-                   " I'm sory but I don't know how to open such a big files" +
-                   "</html>") .format(filePath, statInfo.st_size)
-            QMessageBox.critical(self._mainWindow(), "Too big file", msg)
+            self._openLargeFile(filePath)
             return None
 
         # Check if have access to read
@@ -574,7 +639,11 @@ class Workspace(QStackedWidget):
             return None
 
         # open the file
-        document = Document(self, filePath)
+        if inBackground or statInfo.st_size > _BACKGROUND_LOADING_MIN_SIZE:
+            loader = self._loader
+        else:
+            loader = None
+        document = Document(self, filePath, loader=loader, deferLoading=deferLoading)
         self._handleDocument(document)
 
         if not os.access(filePath, os.W_OK):
@@ -583,8 +652,34 @@ class Workspace(QStackedWidget):
 
         return document
 
+    def _openLargeFile(self, filePath):
+        """Open the file, which is too big for the editor, in :class:`enki.core.largefile.LargeFileViewer`
+        """
+        viewer = self._findLargeFileViewer(filePath)
+        if viewer is not None:
+            viewer.activateWindow()
+            return
+
+        try:
+            viewer = LargeFileViewer(self._mainWindow(), filePath)
+        except (OSError, IOError, ValueError) as ex:  # mmap raises ValueError for empty files
+            QMessageBox.critical(self._mainWindow(), "Failed to open the file", str(ex))
+            return
+
+        self._largeFileViewers.append(viewer)
+        viewer.closed.connect(lambda: self._largeFileViewers.remove(viewer))
+        viewer.show()
+        core.mainWindow().appendMessage(
+            '{} is too big for the editor. It is opened in the read-only viewer'.format(filePath), 5000)
+
+    def _findLargeFileViewer(self, filePath):
+        for viewer in self._largeFileViewers:
+            if self._isSameFile(filePath, viewer.filePath()):
+                return viewer
+        return None
+
     def openFile(self, filePath):
-        """Open file.
+        """Open file. Big files are loaded in the background, see :meth:`enki.core.document.Document.isLoaded`
 
         Return document, if opened, None otherwise
 
@@ -593,7 +688,7 @@ class Workspace(QStackedWidget):
         try:
             QApplication.setOverrideCursor(Qt.WaitCursor)
 
-            document = self._openSingleFile(filePath)
+            document = self._openSingleFile(filePath, False)
         finally:
             QApplication.restoreOverrideCursor()
 
@@ -603,23 +698,48 @@ class Workspace(QStackedWidget):
 
         return document
 
-    def openFiles(self, filePaths):
-        """Open files.
+    def openFiles(self, filePaths, deferLoading=False, stopOnError=True):
+        """Open files. Files are loaded in the background, see :meth:`enki.core.document.Document.isLoaded`
+
+        If ``deferLoading`` is set, a file is loaded, when its document is activated.
+        Other documents are loaded one by one in idle time. Used to restore sessions quickly.
 
-        Open modal message box and stop opening files, if failed to open any file
+        Open modal message box, if failed to open a file. Stop opening files, if ``stopOnError`` is set.
+        Too big files are opened in the read-only viewer, it is not an error
         """
         documents = []
         try:
             QApplication.setOverrideCursor(Qt.WaitCursor)
             for filePath in filePaths:
-                document = self._openSingleFile(filePath)
+                document = self._openSingleFile(filePath, True, deferLoading)
                 if document is None:
-                    break
+                    if stopOnError and self._findLargeFileViewer(filePath) is None:
+                        break
+                    continue
 
                 documents.append(document)
         finally:
             QApplication.restoreOverrideCursor()
 
+        if deferLoading:
+            self._deferredLoadingTimer.start()
+
+    def _loadNextDeferredDocument(self):
+        """Start loading of the next deferred document, if no other document is being loaded
+        """
+        deferredDocument = None
+        for document in self.sortedDocuments:
+            if document.isLoadingDeferred():
+                if deferredDocument is None:
+                    deferredDocument = document
+            elif not document.isLoaded():
+                return  # wait for it
+
+        if deferredDocument is not None:
+            deferredDocument.startLoading()
+        else:
+            self._deferredLoadingTimer.stop()
+
     def findDocumentForPath(self, filePath):
         """Try to find document for path.
         Fimilar to open(), but doesn't open file, if it is not opened
@@ -0,0 +1,354 @@
+"""
+fuzzymatch --- Fuzzy path matching and ranking
+==============================================
+
+Used by the FuzzyOpen plugin.
+
+The module doesn't import Qt and Enki core, because it is imported by the scoring worker processes
+
+NumPy is optional. If it is installed, :class:`CharMaskIndex` filters files with vectorized operations
+"""
+
+import heapq
+import multiprocessing
+import os
+import os.path
+import pickle
+import sys
+import tempfile
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def fuzzyMatch(reversed_pattern, text):
+    """Match text with pattern and return
+        (score, list of matching indexes)
+        or None
+
+    Score is a summa or distances of continuos matched peaces from the end of the text.
+    Less peaces -> better mathing
+    Peaces close to the end -> better matching
+
+    Reverse matching is used because symbols at the end of the path are usually more impotant.
+
+    pattern shall be already reversed for performance reasons
+    """
+    indexes = []
+    score = 0
+    text_len = len(text)
+
+    index = text_len + 1
+    prev_match = index
+    for char in reversed_pattern:
+        index = text.rfind(char, 0, index)
+        if index == -1:
+            return None, None
+
+        indexes.append(index)
+        if index + 1 != prev_match:
+            score += text_len - index
+
+        prev_match = index
+
+    # find next /. Closer - better
+    slash_index = text.rfind(os.sep, 0, index)
+    if slash_index != -1:
+        score += index - slash_index
+
+    return score, indexes
+
+
+def indexesToRanges(indexes, offset=0):
+    """Convert list of matching indexes to sorted list of (start, length).
+    Indexes before ``offset`` are skipped, the rest are shifted by ``-offset``
+    """
+    ranges = []
+    for index in sorted(indexes):
+        index -= offset
+        if index < 0:
+            continue
+        if ranges and ranges[-1][0] + ranges[-1][1] == index:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([index, 1])
+    return [tuple(r) for r in ranges]
+
+
+# Frequent path characters have own bits. Other characters share the rest of bits.
+# Sharing makes the filter less strict, but never rejects matching paths
+_OWN_BIT_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789_-./'
+_CHAR_BITS = {char: 1 << bit for bit, char in enumerate(_OWN_BIT_CHARS)}
+_SHARED_BITS_COUNT = 64 - len(_OWN_BIT_CHARS)
+
+
+def charMask(text):
+    """Get 64-bit mask of characters, which occur in the lowercased text
+    """
+    mask = 0
+    for char in set(text.lower()):
+        bit = _CHAR_BITS.get(char)
+        if bit is None:
+            bit = 1 << (len(_OWN_BIT_CHARS) + ord(char) % _SHARED_BITS_COUNT)
+        mask |= bit
+    return mask
+
+
+class CharMaskIndex:
+    """Character occurrence masks for a list of files.
+
+    Allows to reject files, which don't contain some pattern characters,
+    before running :func:`fuzzyMatch`. Masks are built for lowercased paths,
+    therefore the index works for case sensitive and insensitive matching.
+
+    Building masks for a big project takes time. :meth:`build` can be interrupted and continued
+    """
+
+    _STOP_CHECK_INTERVAL = 1000
+
+    def __init__(self, files):
+        self.files = files
+        self._masks = []
+        self._isReady = False
+
+    def isReady(self):
+        return self._isReady
+
+    def build(self, stopEvent):
+        """Build masks. Return ``True`` if finished, ``False`` if stopped
+        """
+        masks = self._masks
+        files = self.files
+        for i in range(len(masks), len(files)):
+            masks.append(charMask(files[i]))
+            if not (i % self._STOP_CHECK_INTERVAL) and stopEvent.is_set():
+                return False
+
+        if numpy is not None:
+            self._masks = numpy.array(masks, dtype=numpy.uint64)
+        self._isReady = True
+        return True
+
+    def filter(self, pattern, candidates):
+        """Get list of candidate indexes of files, which contain all pattern characters
+        """
+        patternMask = charMask(pattern)
+        if numpy is not None:
+            patternMask = numpy.uint64(patternMask)
+            if isinstance(candidates, range) and len(candidates) == len(self.files):
+                indexes = numpy.flatnonzero((self._masks & patternMask) == patternMask)
+            else:
+                indexes = numpy.array(candidates, dtype=numpy.intp)
+                indexes = indexes[(self._masks[indexes] & patternMask) == patternMask]
+            return indexes.tolist()
+        else:
+            masks = self._masks
+            return [i for i in candidates
+                    if masks[i] & patternMask == patternMask]
+
+
+def _sortedTop(heap):
+    return sorted((-negScore, -negIndex, indexes) for negScore, negIndex, indexes in heap)
+
+
+def scoreFiles(reversed_pattern, files, candidates, excluded, count, stopEvent=None, onProgress=None):
+    """Match files with indexes from ``candidates`` with the pattern.
+
+    Return ``(survivors, top)`` or ``None`` if ``stopEvent`` has been set.
+    ``survivors`` is a list of indexes of all matching files, including excluded.
+    ``top`` is a list of ``(score, index, matching indexes)`` of ``count`` best not excluded files,
+    sorted by score. Files with equal score keep the order of candidates.
+
+    Only ``count`` best files are kept in a bounded heap, the rest are not sorted
+
+    ``onProgress`` is called periodically with a function, which returns ``top`` found so far
+    """
+    survivors = []
+    heap = []  # (-score, -index, matching indexes). Root is the worst of the best
+
+    def getTop():
+        return _sortedTop(heap)
+
+    for checkedCount, i in enumerate(candidates):
+        path = files[i]
+        score, indexes = fuzzyMatch(reversed_pattern, path)
+        if indexes:
+            survivors.append(i)
+            if path not in excluded:
+                if len(heap) < count:
+                    heapq.heappush(heap, (-score, -i, indexes))
+                elif score < -heap[0][0]:
+                    heapq.heapreplace(heap, (-score, -i, indexes))
+
+        if not (checkedCount % 100):
+            if stopEvent is not None and stopEvent.is_set():
+                return None
+            if onProgress is not None:
+                onProgress(getTop)
+
+    return survivors, _sortedTop(heap)
+
+
+_workerFilesPath = None
+_workerFiles = None
+_workerLowerFiles = None
+
+
+def _loadWorkerFiles(filesPath):
+    """Load the copy of files, if the worker doesn't have it yet
+    """
+    global _workerFilesPath, _workerFiles, _workerLowerFiles  # pylint: disable=W0603
+    if filesPath != _workerFilesPath:
+        with open(filesPath, 'rb') as file_:
+            _workerFiles = pickle.load(file_)
+        _workerLowerFiles = None
+        _workerFilesPath = filesPath
+
+
+def _scoreShard(task):
+    """Worker process function
+    """
+    global _workerLowerFiles  # pylint: disable=W0603
+    filesPath, reversed_pattern, caseSensitive, candidates, excluded, count = task
+    _loadWorkerFiles(filesPath)
+    if caseSensitive:
+        files = _workerFiles
+    else:
+        if _workerLowerFiles is None:
+            _workerLowerFiles = [f.lower() for f in _workerFiles]
+        files = _workerLowerFiles
+
+    return scoreFiles(reversed_pattern, files, candidates, excluded, count)
+
+
+def _startPool(processes):
+    """Start pool of spawned processes.
+
+    A spawned process imports the main module of the parent. Enki main module imports Qt,
+    therefore this module is set as the main module while the processes are started
+    """
+    # Do not fork. Enki process has Qt and a few threads
+    context = multiprocessing.get_context('spawn')
+    mainModule = sys.modules['__main__']
+    sys.modules['__main__'] = sys.modules[__name__]
+    try:
+        return context.Pool(processes)
+    finally:
+        sys.modules['__main__'] = mainModule
+
+
+class ParallelScorer:
+    """Pool of processes, which score shards of the file list in parallel.
+
+    The pool is started once and lives until :meth:`terminate`.
+    When the file list has changed, it is written to a temporary file.
+    Workers read the file, when they get the first task for the new list.
+    Every worker returns survivors and the best files of its shard, the results are merged.
+
+    :meth:`score` is called from the Locator loader thread, :meth:`start` and :meth:`terminate`
+    from the GUI thread
+    """
+
+    _SHARDS_PER_PROCESS = 4
+    _POLL_INTERVAL_SEC = 0.05
+
+    def __init__(self, processes=None):
+        self._processes = processes or os.cpu_count() or 1
+        self._pool = None
+        self._files = None
+        self._filesPath = None
+        self._lock = threading.Lock()
+        self._terminated = threading.Event()
+
+    def isUseful(self):
+        """Check if more than 1 CPU is available
+        """
+        return self._processes > 1
+
+    def start(self):
+        """Start the worker processes in advance, so the first big query doesn't wait for them.
+
+        Does nothing, if already started, or if :meth:`score` is running. It starts the processes itself
+        """
+        if self._lock.acquire(False):
+            try:
+                if not self._terminated.is_set() and self._pool is None:
+                    self._pool = _startPool(self._processes)
+            finally:
+                self._lock.release()
+
+    def terminate(self):
+        """Stop the worker processes.
+
+        Running :meth:`score` is interrupted and returns ``None``
+        """
+        self._terminated.set()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+            self._removeFilesCopy()
+
+    def _removeFilesCopy(self):
+        if self._filesPath is not None:
+            try:
+                os.remove(self._filesPath)
+            except OSError:
+                pass
+            self._filesPath = None
+            self._files = None
+
+    def _updateFilesCopy(self, files):
+        if files is not self._files:
+            self._removeFilesCopy()
+            with tempfile.NamedTemporaryFile(prefix='enki-files-', suffix='.pickle', delete=False) as file_:
+                pickle.dump(files, file_, pickle.HIGHEST_PROTOCOL)
+            self._filesPath = file_.name
+            self._files = files
+
+    def score(self, reversed_pattern, caseSensitive, files, candidates, excluded, count, stopEvent,
+              onProgress=None):
+        """Same as :func:`scoreFiles`, but in the worker processes.
+
+        ``files`` shall always be in the original case.
+        ``caseSensitive`` defines if the workers shall use lowercased files
+        """
+        with self._lock:
+            if self._terminated.is_set():
+                return None
+
+            if self._pool is None:
+                self._pool = _startPool(self._processes)
+            self._updateFilesCopy(files)
+
+            shardCount = self._processes * self._SHARDS_PER_PROCESS
+            shardSize = len(candidates) // shardCount + 1
+            tasks = [(self._filesPath, reversed_pattern, caseSensitive, candidates[start:start + shardSize],
+                      excluded, count)
+                     for start in range(0, len(candidates), shardSize)]
+
+            results = self._pool.imap(_scoreShard, tasks)
+
+            survivors = []
+            top = []
+            for _ in tasks:
+                while True:
+                    if stopEvent.is_set() or self._terminated.is_set():
+                        return None
+                    try:
+                        shardSurvivors, shardTop = results.next(self._POLL_INTERVAL_SEC)
+                    except multiprocessing.TimeoutError:
+                        continue
+                    else:
+                        break
+
+                survivors.extend(shardSurvivors)
+                top.extend(shardTop)
+                if onProgress is not None:
+                    onProgress(lambda: heapq.nsmallest(count, top))
+
+            return survivors, heapq.nsmallest(count, top)
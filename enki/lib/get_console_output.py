@@ -36,28 +36,46 @@ def open_console_output(command, cwd=None, **options):
     # with the --noconsole option requires redirecting everything
     # (stdin, stdout, stderr) to avoid a OSError exception
     # "[Error 6] the handle is invalid."
+    # The options may redirect a stream to subprocess.DEVNULL instead of a pipe
+    popenOptions = dict(stdin=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        stdout=subprocess.PIPE)
+    popenOptions.update(options)
     popen = subprocess.Popen(
         command,
-        stdin=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        stdout=subprocess.PIPE,
         startupinfo=si, env=env, cwd=cwd,
-        **options)
+        **popenOptions)
 
     return popen
 
 
-def get_console_output(command, cwd=None, **options):
-    popen = open_console_output(command, cwd, **options)
-    stdout_bin, stderr_bin = popen.communicate()
+def _decode(data):
+    """Decode output of the process. A stream may be not redirected to a pipe
+    """
+    if data is None:
+        return ''
+
     try:
-        stdout = stdout_bin.decode('utf8')
+        return data.decode('utf8')
     except UnicodeDecodeError:
-        stdout = ''
+        return ''
+
+
+def communicate(popen, input=None, timeout=None):
+    """Send input to the started process, wait for it and return (stdout, stderr) as text.
 
+    The process is killed and ``TimeoutError`` is raised, if it doesn't finish in ``timeout`` seconds
+    """
     try:
-        stderr = stderr_bin.decode('utf8')
-    except UnicodeDecodeError:
-        stderr = ''
+        stdout_bin, stderr_bin = popen.communicate(input, timeout)
+    except subprocess.TimeoutExpired:
+        popen.kill()
+        popen.communicate()
+        raise TimeoutError('"{}" has not finished in {} seconds'.format(popen.args[0], timeout))
+
+    return _decode(stdout_bin), _decode(stderr_bin)
 
-    return stdout, stderr
+
+def get_console_output(command, cwd=None, timeout=None, **options):
+    popen = open_console_output(command, cwd, **options)
+    return communicate(popen, timeout=timeout)
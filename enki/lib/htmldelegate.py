@@ -1,14 +1,27 @@
 """
 htmldelegate --- QStyledItemDelegate delegate. Draws HTML
 =========================================================
+
+:class:`HighlightDelegate` draws plain text with highlighted ranges without HTML parsing.
+Items provide it as :data:`HIGHLIGHTED_TEXT_ROLE` data
 """
 
+import math
+
 from PyQt5.QtWidgets import QApplication, \
     QStyledItemDelegate, QStyle, QStyleOptionViewItem, \
     QWidget
 from PyQt5.QtGui import QAbstractTextDocumentLayout, \
-    QTextDocument, QPalette
-from PyQt5.QtCore import QSize
+    QFont, QTextCharFormat, QTextDocument, QTextLayout, QPalette
+from PyQt5.QtCore import QPointF, QSize, Qt
+
+
+HIGHLIGHTED_TEXT_ROLE = Qt.UserRole + 1
+"""Item data role for :class:`HighlightDelegate`.
+
+Data is a list of lines. Every line is ``(text, ranges)``, where ``ranges`` is a list of ``(start, length)``
+of highlighted parts. The first line is drawn with the view font, the next lines are smaller and indented
+"""  # pylint: disable=W0105
 
 
 _HTML_ESCAPE_TABLE = \
@@ -94,3 +107,101 @@ class HTMLDelegate(QStyledItemDelegate):
         #  bad long (multiline) strings processing doc.setTextWidth(options.rect.width())
         doc.setHtml(options.text)
         return QSize(doc.idealWidth(), doc.size().height())
+
+
+class HighlightDelegate(HTMLDelegate):
+    """HTMLDelegate, which draws items with :data:`HIGHLIGHTED_TEXT_ROLE` data with ``QTextLayout``.
+
+    Highlighted ranges are drawn with a precomputed bold format.
+    Items without this data are drawn as HTML
+    """
+
+    _SECONDARY_FONT_SCALE = 1.5
+    _SECONDARY_INDENT = 15
+    _MARGIN = 1
+
+    def __init__(self, parent=None):
+        HTMLDelegate.__init__(self, parent)
+        self._setFont(parent.font() if isinstance(parent, QWidget) else QApplication.instance().font())
+
+    def _setFont(self, font):
+        self._fonts = [font, QFont(font)]
+        if font.pointSizeF() > 0:
+            self._fonts[1].setPointSizeF(font.pointSizeF() / self._SECONDARY_FONT_SCALE)
+        else:  # the size is set in pixels
+            self._fonts[1].setPixelSize(max(1, round(font.pixelSize() / self._SECONDARY_FONT_SCALE)))
+
+        self._highlightFormat = QTextCharFormat()
+        self._highlightFormat.setFontWeight(QFont.Black)
+
+    def _layouts(self, lines):
+        """Create laid out QTextLayout for every line.
+        Return list of (layout, position)
+        """
+        layouts = []
+        y = self._MARGIN
+        for lineIndex, (text, ranges) in enumerate(lines):
+            font = self._fonts[min(lineIndex, 1)]
+            layout = QTextLayout(text, font)
+
+            formats = []
+            for start, length in ranges:
+                formatRange = QTextLayout.FormatRange()
+                formatRange.start = start
+                formatRange.length = length
+                formatRange.format = self._highlightFormat
+                formats.append(formatRange)
+            layout.setFormats(formats)
+
+            layout.beginLayout()
+            layout.createLine()
+            layout.endLayout()
+
+            x = self._MARGIN if lineIndex == 0 else self._MARGIN + self._SECONDARY_INDENT
+            layouts.append((layout, QPointF(x, y)))
+            y += layout.boundingRect().height()
+        return layouts
+
+    def paint(self, painter, option, index):
+        """QStyledItemDelegate.paint implementation
+        """
+        lines = index.data(HIGHLIGHTED_TEXT_ROLE)
+        if lines is None:
+            return HTMLDelegate.paint(self, painter, option, index)
+
+        option.state &= ~QStyle.State_HasFocus  # never draw focus rect
+
+        option.state |= QStyle.State_Active  # draw fuzzy-open completion as focused, even if focus is on the line edit
+
+        options = QStyleOptionViewItem(option)
+        self.initStyleOption(options, index)
+
+        style = QApplication.style() if options.widget is None else options.widget.style()
+
+        options.text = ""
+        style.drawControl(QStyle.CE_ItemViewItem, options, painter)
+
+        textRect = style.subElementRect(QStyle.SE_ItemViewItemText, options)
+        painter.save()
+        painter.translate(textRect.topLeft())
+        painter.setClipRect(textRect.translated(-textRect.topLeft()))
+        painter.setPen(option.palette.color(QPalette.Active, QPalette.Text))
+        for layout, position in self._layouts(lines):
+            layout.draw(painter, position)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        """QStyledItemDelegate.sizeHint implementation
+        """
+        lines = index.data(HIGHLIGHTED_TEXT_ROLE)
+        if lines is None:
+            return HTMLDelegate.sizeHint(self, option, index)
+
+        # Measure the same layouts, which are painted. Highlighted text is wider
+        width = 0
+        height = self._MARGIN
+        for layout, position in self._layouts(lines):
+            width = max(width, position.x() + layout.lineAt(0).naturalTextWidth())
+            height = position.y() + layout.boundingRect().height()
+
+        return QSize(math.ceil(width) + self._MARGIN, math.ceil(height) + self._MARGIN)
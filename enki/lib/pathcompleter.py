@@ -8,9 +8,13 @@ from PyQt5.QtCore import QFileInfo
 from PyQt5.QtWidgets import QApplication, QFileIconProvider, QStyle
 from PyQt5.QtGui import QPalette
 
+import copy
+import fnmatch
 import os
 import os.path
 import glob
+import threading
+from collections import OrderedDict
 
 from enki.lib.htmldelegate import htmlEscape
 from enki.core.locator import AbstractCompleter
@@ -18,6 +22,97 @@ from enki.core.core import core
 from functools import reduce
 
 
+_MAX_CHECKED_DIRECTORIES = 100  # loaded completer is reused only if it depends on fewer directories
+
+
+def _currentDir():
+    """Get process current directory or None, if it has been deleted
+    """
+    try:
+        return os.getcwd()
+    except OSError:
+        return None
+
+
+def _mtime(path):
+    """Get modification time of the path or None, if it doesn't exist
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _listedDirectories(pattern):
+    """Get directories, which are listed or checked when the glob pattern is expanded.
+
+    If the expansion result changes, modification time of one of these directories changes
+    """
+    dirs = []
+    child = pattern
+    level = os.path.dirname(pattern)
+    while glob.has_magic(child):  # levels above the first wildcard are not listed
+        if level:
+            dirs.extend(glob.glob(level))
+        else:
+            dirs.append(os.path.curdir)
+
+        parent = os.path.dirname(level)
+        if parent == level:
+            break
+        child, level = level, parent
+
+    return dirs
+
+
+class _DirectoryListingCache:
+    """Listings of recently completed directories.
+
+    Typing a file name in a directory creates a new completer on every key.
+    Listing is reused while modification time of the directory is the same.
+    Shared by all completers
+    """
+
+    _SIZE = 16
+
+    def __init__(self):
+        self._listings = OrderedDict()  # path: (mtime, [(name, isDir)])
+        self._lock = threading.Lock()
+
+    def listing(self, path):
+        """Get ``(mtime, entries)``, where entries is a sorted list of ``(name, isDir)``.
+
+        Raises OSError
+        """
+        mtime = os.stat(path).st_mtime_ns  # before listing. Changes made while listing invalidate it
+
+        with self._lock:
+            cached = self._listings.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._listings.move_to_end(path)
+                return cached
+
+        entries = []
+        for entry in os.scandir(path):
+            try:
+                isDir = entry.is_dir()  # d_type is used, stat() only for symlinks
+            except OSError:
+                isDir = False
+            entries.append((entry.name, isDir))
+        entries.sort()
+
+        with self._lock:
+            self._listings[path] = (mtime, entries)
+            self._listings.move_to_end(path)
+            while len(self._listings) > self._SIZE:
+                self._listings.popitem(last=False)
+
+        return mtime, entries
+
+
+_listingCache = _DirectoryListingCache()
+
+
 def makeSuitableCompleter(text):
     """Returns PathCompleter if text is normal path or GlobCompleter for glob
     """
@@ -45,6 +140,8 @@ class AbstractPathCompleter(AbstractCompleter):
         self._files = []
         self._error = None
         self._status = None
+        self._dirMtimes = {}  # directory: modification time when loaded
+        self._cacheKey = (text, _currentDir(), core.fileFilter().matcher())
 
         """hlamer: my first approach is making self._model static member of class. But, sometimes it
         returns incorrect icons. I really can't understand when and why.
@@ -52,13 +149,45 @@ class AbstractPathCompleter(AbstractCompleter):
         """
         self._model = None  # can't construct in the construtor, must be constructed in GUI thread
 
+    def cacheKey(self):
+        """Loaded completer is valid while the text, current directory and file filter are the same
+        and listed directories are not modified
+        """
+        return self._cacheKey
+
+    def isUpToDate(self):
+        """Called in the GUI thread. Stats not more than ``_MAX_CHECKED_DIRECTORIES`` directories
+        """
+        if self._dirMtimes is None:  # too many directories to check
+            return False
+        return all([_mtime(path) == mtime
+                    for path, mtime in self._dirMtimes.items()])
+
+    def _rememberMtimes(self, dirs):
+        """Remember modification time of listed directories before listing.
+        If there are too many of them, the completer is never up to date
+        """
+        if len(dirs) > _MAX_CHECKED_DIRECTORIES:
+            self._dirMtimes = None
+            return
+
+        for path in dirs:
+            self._dirMtimes[path] = _mtime(path)
+
     @staticmethod
-    def _filterHidden(paths):
-        """Remove hidden and ignored files from the list
+    def _isHidden(path, fileMatcher):
+        """Check if the file is hidden or ignored
         """
-        return [path for path in paths
-                if not os.path.basename(path).startswith('.') and
-                not core.fileFilter().regExp().match(path)]
+        return os.path.basename(path).startswith('.') or \
+            fileMatcher.isIgnored(path)
+
+    def _partialCompleter(self):
+        """Make completer, which shows directories and files found so far
+        """
+        partial = copy.copy(self)
+        partial._dirs = sorted(self._dirs)
+        partial._files = sorted(self._files)
+        return partial
 
     def _classifyRowIndex(self, row):
         """Get list item type and index by it's row
@@ -188,25 +317,30 @@ class PathCompleter(AbstractPathCompleter):
         if self._path != '/':
             self._path += '/'
 
-        if not os.path.isdir(self._path):
+        try:
+            mtime, entries = _listingCache.listing(self._path)
+        except (FileNotFoundError, NotADirectoryError):
+            self._rememberMtimes([self._path])
             self._status = 'No directory %s' % self._path
             return
-
-        try:
-            filesAndDirs = os.listdir(self._path)
         except OSError as ex:
+            self._rememberMtimes([self._path])
             self._error = str(ex)
             return
 
-        if not filesAndDirs:
+        self._dirMtimes[self._path] = mtime
+
+        if not entries:
             self._status = 'Empty directory'
             return
 
         # filter matching
-        variants = [path for path in filesAndDirs
-                    if path.startswith(enterredFile)]
+        variants = [entry for entry in entries
+                    if entry[0].startswith(enterredFile)]
 
-        notHiddenVariants = self._filterHidden(variants)
+        fileMatcher = core.fileFilter().matcher()
+        notHiddenVariants = [entry for entry in variants
+                             if not self._isHidden(entry[0], fileMatcher)]
         """If list if not ignored (not hidden) variants is empty, we use list of
         hidden variants.
         Use case: user types path "~/.", dotfiles shall be visible and completed
@@ -214,14 +348,15 @@ class PathCompleter(AbstractPathCompleter):
         if notHiddenVariants:
             variants = notHiddenVariants
 
-        variants.sort()
-
-        for variant in variants:
-            absPath = os.path.join(self._path, variant)
-            if os.path.isdir(absPath):
+        for name, isDir in variants:
+            if stopEvent.is_set():
+                return
+            absPath = os.path.join(self._path, name)
+            if isDir:
                 self._dirs.append(absPath)
             else:
                 self._files.append(absPath)
+            self.publishPartialResult(self._partialCompleter)
 
         if not self._dirs and not self._files:
             self._status = 'No matching files'
@@ -279,24 +414,92 @@ class GlobCompleter(AbstractPathCompleter):
     """Path completer for Locator. Supports globs, does not support inline completion
 
     Used by Open command
+
+    While loading, the completer also collects paths, which match the text without the trailing ``*``.
+    The Open command opens them without globbing again.
+    If too many files match, the search is stopped and the files are not opened
     """
 
+    _MAX_MATCH_COUNT = 10000
+    _MAX_EXPANDED_COUNT = 1000
+
     def __init__(self, text):
         AbstractPathCompleter.__init__(self, text)
+        self._expandedFiles = None
 
     def load(self, stopEvent):
-        variants = glob.iglob(os.path.expanduser(self._originalText) + '*')
-        variants = sorted(self._filterHidden(variants))
-
-        for path in sorted(variants):
-            if os.path.isdir(path):
-                self._dirs.append(path)
-            else:
-                self._files.append(path)
+        exactPattern = os.path.expanduser(self._originalText)
+        pattern = exactPattern + '*'
+        self._rememberMtimes(_listedDirectories(pattern))
+        fileMatcher = core.fileFilter().matcher()
+
+        """Paths matching both patterns are in the same directories,
+        it is enough to compare the last segment.
+        Hidden and ignored files are not shown, but are opened, if they match exactly, as glob.glob() does
+        """
+        exactName = os.path.basename(exactPattern)
+        expandedFiles = []
+        onlyFilesMatchExactly = bool(exactName)  # 'dir/*/' matches only directories
+
+        for matchCount, path in enumerate(glob.iglob(pattern)):
+            if stopEvent.is_set():
+                return
+            isShown = matchCount < self._MAX_MATCH_COUNT
+            if matchCount == self._MAX_MATCH_COUNT:
+                self._status = 'Too many matching files. First {} are shown'.format(self._MAX_MATCH_COUNT)
+            if not isShown and not onlyFilesMatchExactly:
+                break  # the rest is not shown and not opened
+
+            # Files to open are collected after the shown rows are limited
+            isExact = onlyFilesMatchExactly and fnmatch.fnmatch(os.path.basename(path), exactName)
+            isHidden = self._isHidden(path, fileMatcher)
+            if (isHidden or not isShown) and not isExact:
+                continue
+
+            isDir = os.path.isdir(path)
+            if isExact:
+                if isDir:
+                    onlyFilesMatchExactly = False
+                elif len(expandedFiles) == self._MAX_EXPANDED_COUNT:
+                    self._status = 'More than {} files match. Search is stopped, files are not opened'.format(
+                        self._MAX_EXPANDED_COUNT)
+                    onlyFilesMatchExactly = False
+                    break
+                else:
+                    expandedFiles.append(path)
+
+            if isShown and not isHidden:
+                if isDir:
+                    self._dirs.append(path)
+                else:
+                    self._files.append(path)
+                self.publishPartialResult(self._partialCompleter)
+
+        if onlyFilesMatchExactly and expandedFiles:
+            self._expandedFiles = sorted(expandedFiles)
+
+        self._dirs.sort()
+        self._files.sort()
 
         if not self._dirs and not self._files:
             self._status = 'No matching files'
 
+    def expandedFiles(self):
+        """Sorted list of files, which match the text exactly.
+
+        ``None``, if the text matches nothing or directories, or more than ``_MAX_EXPANDED_COUNT`` files,
+        or if the completer has not been loaded.
+        Not limited by the count of shown rows
+        """
+        return self._expandedFiles
+
+    def _partialCompleter(self):
+        """Make completer, which shows directories and files found so far, and the progress
+        """
+        partial = AbstractPathCompleter._partialCompleter(self)
+        partial._status = 'Searching... {} found'.format(len(self._dirs) + len(self._files))
+        return partial
+
     def _formatPath(self, path, isDir):
         """GlobCompleter shows paths as is
         """
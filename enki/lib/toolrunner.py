@@ -0,0 +1,186 @@
+"""
+toolrunner --- Shared runner of external tools
+==============================================
+
+Plugins run console utilities (ctags, linters, ...) through the single :class:`ToolRunner` instance,
+which is available as ``core.toolRunner()``.
+
+* Tools are executed in a thread pool. Results are delivered to the thread, which has started the run
+* Every tool is executed not more than ``maxRunsPerTool`` times at once. Other runs wait in the queue
+* A new run with the same ``supersedeKey`` cancels the previous one
+* Results of probes (``ctags --version``) are cached while the tool executable is not modified
+"""
+
+import os
+import shutil
+import threading
+
+import enki.lib.get_console_output as gco
+from enki.lib.future import AsyncController
+
+
+RUN_TIMEOUT_SEC = 60
+PROBE_TIMEOUT_SEC = 5
+
+
+class _Run:
+    """State of the asynchronous run. Shared between the starting thread and the pool thread
+    """
+
+    def __init__(self, supersedeKey):
+        self.supersedeKey = supersedeKey
+        self.future = None
+        self.popen = None
+        self.cancelled = False
+
+
+class ToolRunner:
+    """Executes external tools synchronously and asynchronously.
+
+    Synchronous methods may be called from any thread.
+    Asynchronous methods shall be called from a thread with an event loop, usually from the GUI thread
+    """
+
+    def __init__(self, maxThreadCount=4, maxRunsPerTool=2):
+        self._controller = AsyncController(maxThreadCount)
+        self._maxRunsPerTool = maxRunsPerTool
+        self._lock = threading.Lock()
+        self._semaphores = {}  # tool name: semaphore
+        self._runs = {}  # supersede key: _Run
+        self._probeCache = {}  # (real path, mtime, args): (stdout, stderr)
+
+    def terminate(self):
+        """Kill running tools and stop the thread pool
+        """
+        with self._lock:
+            runs = list(self._runs.values())
+            self._runs.clear()
+        for run in runs:
+            self._cancelRun(run)
+
+        self._controller.terminate()
+
+    def _semaphore(self, command):
+        name = os.path.basename(command[0])
+        with self._lock:
+            if name not in self._semaphores:
+                self._semaphores[name] = threading.BoundedSemaphore(self._maxRunsPerTool)
+            return self._semaphores[name]
+
+    def toolSlot(self, command):
+        """Context manager, which waits, until the tool may be started, and holds the slot.
+
+        Use it, if a plugin starts the process itself
+        """
+        return self._semaphore(command)
+
+    def execute(self, command, cwd=None, timeout=RUN_TIMEOUT_SEC):
+        """Run the tool in the current thread and return ``(stdout, stderr)``.
+
+        Raises ``OSError`` if failed to start the tool and ``TimeoutError`` on timeout
+        """
+        with self.toolSlot(command):
+            return gco.get_console_output(command, cwd, timeout=timeout)
+
+    def _executeRun(self, run, command, cwd, input, timeout):
+        try:
+            with self.toolSlot(command):
+                with self._lock:
+                    if run.cancelled:
+                        return None
+                    run.popen = gco.open_console_output(command, cwd)
+                return gco.communicate(run.popen, input, timeout)
+        finally:
+            self._forgetRun(run)
+
+    def run(self, callback, command, cwd=None, input=None, timeout=RUN_TIMEOUT_SEC, supersedeKey=None):
+        """Run the tool in the thread pool.
+
+        ``callback(future)`` is called in the current thread. ``future.result`` is ``(stdout, stderr)``
+        or raises ``OSError``. See :mod:`enki.lib.future`.
+
+        If ``supersedeKey`` is not ``None``, the previous run with the same key is cancelled.
+        It is not started, if still waiting, or killed. Its callback is not called
+        """
+        run = self._startRun(supersedeKey)
+        run.future = self._controller.start(callback, self._executeRun, run, command, cwd, input, timeout)
+        return run.future
+
+    def _probeKey(self, path, args):
+        executable = shutil.which(path)
+        if executable is None:
+            return None
+
+        try:
+            mtime = os.stat(executable).st_mtime_ns
+        except OSError:
+            return None
+
+        return (os.path.realpath(executable), mtime, tuple(args))
+
+    def probe(self, path, args, timeout=PROBE_TIMEOUT_SEC):
+        """Run the tool with ``args`` in the current thread and return ``(stdout, stderr)``.
+
+        Used to check the tool version and features. The result is cached while the executable is not modified.
+        Raises ``OSError`` if failed to execute the tool
+        """
+        key = self._probeKey(path, args)
+        with self._lock:
+            if key in self._probeCache:
+                return self._probeCache[key]
+
+        with self.toolSlot([path]):
+            result = gco.get_console_output([path] + list(args), timeout=timeout)
+
+        if key is not None:
+            with self._lock:
+                self._probeCache[key] = result
+        return result
+
+    def _probeRun(self, run, path, args, timeout):
+        try:
+            return self.probe(path, args, timeout)
+        finally:
+            self._forgetRun(run)
+
+    def probeAsync(self, callback, path, args, timeout=PROBE_TIMEOUT_SEC, supersedeKey=None):
+        """Same as :meth:`probe`, but in the thread pool. See :meth:`run` for the parameters
+        """
+        run = self._startRun(supersedeKey)
+        run.future = self._controller.start(callback, self._probeRun, run, path, args, timeout)
+        return run.future
+
+    def cancel(self, supersedeKey):
+        """Cancel the run with the key, if it is waiting or running. Its callback is not called
+        """
+        with self._lock:
+            run = self._runs.pop(supersedeKey, None)
+        if run is not None:
+            self._cancelRun(run)
+
+    def _startRun(self, supersedeKey):
+        run = _Run(supersedeKey)
+        if supersedeKey is not None:
+            with self._lock:
+                previous = self._runs.get(supersedeKey)
+                self._runs[supersedeKey] = run
+            if previous is not None:
+                self._cancelRun(previous)
+        return run
+
+    def _forgetRun(self, run):
+        if run.supersedeKey is not None:
+            with self._lock:
+                if self._runs.get(run.supersedeKey) is run:
+                    del self._runs[run.supersedeKey]
+
+    def _cancelRun(self, run):
+        run.future.cancel(True)
+        with self._lock:
+            run.cancelled = True
+            popen = run.popen
+        if popen is not None:
+            try:
+                popen.kill()
+            except OSError:  # already finished
+                pass
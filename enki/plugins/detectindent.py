@@ -28,7 +28,10 @@ class Plugin:
     def _onDocumentOpened(self, document):
         """Signal handler. Document had been opened
         """
-        self._detectAndApplyIndentation(document)
+        if document.isLoaded():
+            self._detectAndApplyIndentation(document)
+        else:
+            document.loaded.connect(lambda: self._detectAndApplyIndentation(document))
 
     def _onLanguageChanged(self, document, language):
         """Signal handler. Document language had been changed
@@ -1,13 +1,22 @@
 from enki.core.core import core
-from enki.plugins.fuzzyopen.fuzzyopen import FuzzyOpenCommand, ScanCommand
+from enki.lib.fuzzymatch import ParallelScorer
+from enki.plugins.fuzzyopen.fuzzyopen import FuzzyOpenCommand, ScanCommand, startParallelScorer
 
 
 class Plugin:
 
     def __init__(self):
+        parallelScorer = ParallelScorer()
+        if parallelScorer.isUseful():
+            FuzzyOpenCommand.parallelScorer = parallelScorer
         core.locator().addCommandClass(FuzzyOpenCommand)
         core.locator().addCommandClass(ScanCommand)
+        core.project().filesReady.connect(startParallelScorer)
 
     def terminate(self):
+        core.project().filesReady.disconnect(startParallelScorer)
+        if FuzzyOpenCommand.parallelScorer is not None:
+            FuzzyOpenCommand.parallelScorer.terminate()
+            FuzzyOpenCommand.parallelScorer = None
         core.locator().removeCommandClass(FuzzyOpenCommand)
-        core.locator().addCommandClass(ScanCommand)
+        core.locator().removeCommandClass(ScanCommand)
@@ -1,64 +1,132 @@
+import copy
 import os
 import os.path
 
 from enki.core.core import core
 
 from enki.core.locator import AbstractCommand, AbstractCompleter, StatusCompleter, InvalidCmdArgs
+from enki.lib.fuzzymatch import CharMaskIndex, fuzzyMatch, indexesToRanges, scoreFiles
 
 
-def fuzzyMatch(reversed_pattern, text):
-    """Match text with pattern and return
-        (score, list of matching indexes)
-        or None
+_MAX_COUNT = 32
+
+_PARALLEL_SCORING_THRESHOLD = 100000  # candidates. Less files are scored faster in the thread
+
+_charMaskIndex = None  # CharMaskIndex for current project files. Shared by all FuzzyOpen sessions
 
-    Score is a summa or distances of continuos matched peaces from the end of the text.
-    Less peaces -> better mathing
-    Peaces close to the end -> better matching
 
-    Reverse matching is used because symbols at the end of the path are usually more impotant.
+def _getCharMaskIndex(files, stopEvent):
+    """Get character mask index for project files.
 
-    pattern shall be already reversed for performance reasons
+    Index is built in the loader thread when the first completer for new project files is loaded,
+    i.e. right after ``Project.filesReady``.
+    Return ``None`` if building has been interrupted. It will be continued next time
     """
-    indexes = []
-    score = 0
-    text_len = len(text)
+    global _charMaskIndex  # pylint: disable=W0603
+    if _charMaskIndex is None or _charMaskIndex.files is not files:
+        _charMaskIndex = CharMaskIndex(files)
 
-    index = text_len + 1
-    prev_match = index
-    for char in reversed_pattern:
-        index = text.rfind(char, 0, index)
-        if index == -1:
-            return None, None
+    if not _charMaskIndex.isReady():
+        if not _charMaskIndex.build(stopEvent):
+            return None
 
-        indexes.append(index)
-        if index + 1 != prev_match:
-            score += text_len - index
+    return _charMaskIndex
 
-        prev_match = index
 
-    # find next /. Closer - better
-    slash_index = text.rfind(os.sep, 0, index)
-    if slash_index != -1:
-        score += index - slash_index
+def startParallelScorer():
+    """Start the scoring processes in advance, if the project is big enough to use them.
 
-    return score, indexes
+    Called when project files are ready
+    """
+    files = core.project().files()
+    if FuzzyOpenCommand.parallelScorer is not None and \
+       core.config()['FuzzyOpen']['ParallelScoring'] and \
+       files is not None and \
+       len(files) >= _PARALLEL_SCORING_THRESHOLD:
+        FuzzyOpenCommand.parallelScorer.start()
 
 
-_MAX_COUNT = 32
+class _MatcherState:
+    """Fuzzy matching state, which lives as long as the FuzzyOpenCommand.
+
+    Caches lowercased project files and remembers which files matched the previous pattern.
+    If the new pattern extends the previous one, only the previous survivors are matched again.
+
+    Used only by the completer loader thread
+    """
+
+    def __init__(self):
+        self._files = None
+        self._lowerFiles = None
+        self._pattern = None
+        self._caseSensitive = False
+        self._survivors = None
+
+    def _setFiles(self, files):
+        if files is not self._files:
+            self._files = files
+            self._lowerFiles = None
+            self._pattern = None
+            self._survivors = None
+
+    def matchedFiles(self, files, caseSensitive):
+        """Get list of files in the case, which is used for matching
+        """
+        self._setFiles(files)
+        if caseSensitive:
+            return files
+
+        if self._lowerFiles is None:
+            self._lowerFiles = [f.lower() for f in files]
+        return self._lowerFiles
+
+    def candidates(self, files, pattern, caseSensitive, stopEvent):
+        """Get indexes of files, which might match the pattern.
+
+        Files, which don't contain all pattern characters, are rejected with the character mask index.
+        Return ``None`` if stopped
+        """
+        self._setFiles(files)
+        candidates = range(len(files))
+        if self._survivors is not None:
+            if self._caseSensitive:
+                extends = caseSensitive and pattern.startswith(self._pattern)
+            else:
+                extends = pattern.lower().startswith(self._pattern)
+
+            if extends:
+                candidates = self._survivors
+
+        charMaskIndex = _getCharMaskIndex(files, stopEvent)
+        if charMaskIndex is None:
+            return None
+
+        return charMaskIndex.filter(pattern, candidates)
+
+    def setSurvivors(self, pattern, caseSensitive, survivors):
+        """Remember indexes of files, which matched the pattern.
+
+        Must be called only if all candidates have been checked
+        """
+        self._pattern = pattern
+        self._caseSensitive = caseSensitive
+        self._survivors = survivors
 
 
 class FuzzyOpenCompleter(AbstractCompleter):
 
     mustBeLoaded = True
 
-    def __init__(self, pattern, files):
-        smallerFont = core.mainWindow().font().pointSizeF() * 2 / 1.5
-        self._itemTemplate = (
-            '{{}}'
-            '<div style="margin: 15px; font-size:{smallerFont}pt">{{}}</div>'.format(smallerFont=smallerFont))
-
+    def __init__(self, pattern, files, matcherState, parallelScorer=None):
         self._pattern = pattern
         self._files = files
+        self._origCaseOpenFiles = self._openFiles()  # workspace is accessed only from the GUI thread
+        self._cacheKey = (pattern,
+                          core.project().path(),
+                          core.project().filesVersion(),
+                          tuple(self._origCaseOpenFiles))
+        self._matcherState = matcherState
+        self._parallelScorer = parallelScorer
         self._items = []
 
     def _openFiles(self):
@@ -74,8 +142,11 @@ class FuzzyOpenCompleter(AbstractCompleter):
         return files
 
 
+    def cacheKey(self):
+        return self._cacheKey
+
     def load(self, stopEvent):
-        origCaseOpenFiles = self._openFiles()
+        origCaseOpenFiles = self._origCaseOpenFiles
 
         origCaseFiles = self._files
 
@@ -85,14 +156,12 @@ class FuzzyOpenCompleter(AbstractCompleter):
             self._pattern = self._pattern.lower()
 
         if self._pattern:
+            pattern = self._pattern
             if caseSensitive:
-                pattern = self._pattern
                 openFiles = origCaseOpenFiles
-                files = origCaseFiles
             else:
-                pattern = self._pattern.lower()
                 openFiles = [f.lower() for f in origCaseOpenFiles]
-                files = [f.lower() for f in origCaseFiles]
+            openFilesSet = set(openFiles)
 
             reversed_pattern = pattern[::-1]
 
@@ -105,23 +174,55 @@ class FuzzyOpenCompleter(AbstractCompleter):
                     # Using original case path here
                     matching.append((origCaseOpenFiles[i], score, indexes))
 
-            for i, path in enumerate(files):
-                if path not in openFiles:
-                    score, indexes = fuzzyMatch(reversed_pattern, path)
-                    if indexes:
-                        matching.append((origCaseFiles[i], score, indexes))
+            candidates = self._matcherState.candidates(origCaseFiles, pattern, caseSensitive, stopEvent)
+            if candidates is None:  # stopped
+                return
 
-                    if not (i % 100):
-                        if stopEvent.is_set():
-                            return
+            def onProgress(getTop):
+                self.publishPartialResult(
+                    lambda: self._partialCompleter(self._mergeItems(matching, getTop())))
 
-            matching.sort(key=lambda item: item[1])  # sort starting from minimal score
-            self._items = matching[:_MAX_COUNT]
+            if self._parallelScorer is not None and \
+               len(candidates) >= _PARALLEL_SCORING_THRESHOLD:
+                result = self._parallelScorer.score(reversed_pattern, caseSensitive, origCaseFiles,
+                                                    candidates, openFilesSet, _MAX_COUNT, stopEvent,
+                                                    onProgress)
+            else:
+                files = self._matcherState.matchedFiles(origCaseFiles, caseSensitive)
+                result = scoreFiles(reversed_pattern, files, candidates, openFilesSet, _MAX_COUNT, stopEvent,
+                                    onProgress)
+
+            if result is None:  # stopped
+                return
+
+            survivors, top = result
+            self._matcherState.setSurvivors(pattern, caseSensitive, survivors)
+
+            self._items = self._mergeItems(matching, top)
         else:
-            allFiles = origCaseOpenFiles + [f
-                                            for f in origCaseFiles
-                                            if f not in origCaseOpenFiles]
-            self._items = [(item, 0, []) for item in allFiles[:_MAX_COUNT]]
+            openFilesSet = set(origCaseOpenFiles)
+            allFiles = origCaseOpenFiles[:_MAX_COUNT]
+            for f in origCaseFiles:
+                if len(allFiles) >= _MAX_COUNT:
+                    break
+                if f not in openFilesSet:
+                    allFiles.append(f)
+            self._items = [(item, 0, []) for item in allFiles]
+
+    def _mergeItems(self, openFilesMatching, top):
+        """Merge matching open files with top of project files
+        """
+        matching = openFilesMatching + [(self._files[i], score, indexes)
+                                        for score, i, indexes in top]
+        matching.sort(key=lambda item: item[1])  # sort starting from minimal score
+        return matching[:_MAX_COUNT]
+
+    def _partialCompleter(self, items):
+        """Make completer, which shows partial result
+        """
+        partial = copy.copy(self)
+        partial._items = items
+        return partial
 
     def rowCount(self):
         return len(self._items)
@@ -129,14 +230,12 @@ class FuzzyOpenCompleter(AbstractCompleter):
     def columnCount(self):
         return 1
 
-    def text(self, row, column):
+    def highlightedText(self, row, column):
         path, score, indexes = self._items[row]
         basename = os.path.basename(path)
-        chars = ['<span style="font-weight:900;">{}</span>'.format(char) if charIndex in indexes else char
-                 for charIndex, char in enumerate(path)]
-        pathFormatted = ''.join(chars)
-        basenameFormatted = ''.join(chars[-len(basename):])
-        return self._itemTemplate.format(basenameFormatted, pathFormatted)
+        basenameStart = len(path) - len(basename)
+        return [(basename, indexesToRanges(indexes, basenameStart)),
+                (path, indexesToRanges(indexes))]
 
     def autoSelectItem(self):
         return (0, 0)
@@ -154,6 +253,8 @@ class FuzzyOpenCommand(AbstractCommand):
     description = 'Open file in project. Fuzzy match the path'
     isDefaultCommand = True
 
+    parallelScorer = None  # enki.lib.fuzzymatch.ParallelScorer, set by the plugin
+
     @staticmethod
     def isAvailable():
         return core.project().path() is not None
@@ -162,22 +263,25 @@ class FuzzyOpenCommand(AbstractCommand):
         AbstractCommand.__init__(self)
         self._completer = None
         self._clickedPath = None
+        self._matcherState = _MatcherState()
 
         core.project().filesReady.connect(self.updateCompleter)
         core.project().scanStatusChanged.connect(self.updateCompleter)
-        if not core.project().isScanning():
-            core.project().startLoadingFiles()
-            self._iHaveStartedScan = True
-        else:
-            self._iHaveStartedScan = False
+        core.project().startLoadingFiles()
 
     def terminate(self):
-        if self._iHaveStartedScan:
-            core.project().cancelLoadingFiles()
-
         core.project().filesReady.disconnect(self.updateCompleter)
         core.project().scanStatusChanged.disconnect(self.updateCompleter)
 
+    def onDialogShown(self):
+        """The command is reused by the Locator. Forget the previous choice.
+        Project could be changed, start loading files, if not loaded yet.
+
+        Scanning is not cancelled when the Locator is closed. Files will be ready for the next invocation
+        """
+        self._clickedPath = None
+        core.project().startLoadingFiles()
+
     def setArgs(self, args):
         if len(args) > 1 and \
            all([c.isdigit() for c in args[-1]]):
@@ -190,7 +294,12 @@ class FuzzyOpenCommand(AbstractCommand):
 
     def completer(self):
         if core.project().files() is not None:
-            return FuzzyOpenCompleter(self._pattern, core.project().files())
+            if core.config()['FuzzyOpen']['ParallelScoring']:
+                parallelScorer = self.parallelScorer
+            else:
+                parallelScorer = None
+            return FuzzyOpenCompleter(self._pattern, core.project().files(),
+                                      self._matcherState, parallelScorer)
         else:
             return StatusCompleter("<i>{}</i>".format(core.project().scanStatus()))
 
@@ -3,6 +3,7 @@
 
 import os.path
 import collections
+import hashlib
 import queue
 
 from PyQt5.QtCore import pyqtSignal, QObject, QThread, QTimer
@@ -13,10 +14,12 @@ from PyQt5 import uic
 
 from enki.core.core import core
 from enki.core.uisettings import TextOption, CheckableOption
-import enki.lib.get_console_output as gco
 
 from . import ctags
+from . import pythonoutline
 from .dock import NavigatorDock
+from .gotosymbol import GoToSymbolCommand
+from .symbolindex import SymbolIndex
 
 
 # source map. 1 ctags language is mapped to multiply Qutepart languages
@@ -72,23 +75,40 @@ for ctagsLang, qutepartLangs in _CTAGS_TO_QUTEPART_LANG_MAP.items():
         _QUTEPART_TO_CTAGS_LANG_MAP[qutepartLang] = ctagsLang
 
 
+# Parsers, which work without ctags. Used for languages listed in Navigator/BuiltInParsers option
+_BUILTIN_PARSERS = {
+    "Python": pythonoutline.processText
+}
+
+
 class ProcessorThread(QThread):
-    """Thread processes text with ctags and returns tags
+    """Thread processes text with ctags or a built-in parser and returns tags
+
+    Tags of recently processed texts are cached. Switching documents doesn't run ctags again.
+    Cached tags are shared and must not be modified
     """
     tagsReady = pyqtSignal(list)
     error = pyqtSignal(str)
 
-    _Task = collections.namedtuple("Task", ["ctagsLang", "text", "sortAlphabetically"])
+    _Task = collections.namedtuple("Task", ["ctagsLang", "text", "sortAlphabetically", "useBuiltInParser",
+                                            "cacheKey"])
+
+    _CACHE_SIZE = 32
 
     def __init__(self):
         QThread.__init__(self)
         self._queue = queue.Queue()
+        self._cache = collections.OrderedDict()  # cache key: tags. Used only by the thread
         self.start(QThread.LowPriority)
 
     def process(self, ctagsLang, text, sortAlphabetically):
         """Parse text and emit tags
         """
-        self._queue.put(self._Task(ctagsLang, text, sortAlphabetically))
+        useBuiltInParser = ctagsLang in _BUILTIN_PARSERS and \
+            ctagsLang in core.config()['Navigator']['BuiltInParsers']
+        # Ctags path is in the key, because other ctags version may return other tags
+        cacheKey = (core.config()['Navigator']['CtagsPath'], ctagsLang, sortAlphabetically, useBuiltInParser)
+        self._queue.put(self._Task(ctagsLang, text, sortAlphabetically, useBuiltInParser, cacheKey))
 
     def stopAsync(self):
         self._queue.put(None)
@@ -106,37 +126,78 @@ class ProcessorThread(QThread):
             if task is None:  # None is a quit command
                 break
 
-            try:
-                tags = ctags.processText(task.ctagsLang, task.text, task.sortAlphabetically)
-            except ctags.FailedException as ex:
-                self.error.emit(ex.args[0])
+            textHash = hashlib.sha1(task.text.encode('utf8', 'surrogatepass')).digest()
+            cacheKey = task.cacheKey + (textHash,)
+            tags = self._cache.get(cacheKey)
+            if tags is not None:
+                self._cache.move_to_end(cacheKey)
             else:
-                if not self._queue.qsize():  # Do not emit results, if having new task
-                    self.tagsReady.emit(tags)
+                try:
+                    tags = self._parse(task)
+                except ctags.FailedException as ex:
+                    self.error.emit(ex.args[0])
+                    continue
+
+                if tags is None:
+                    continue
+
+                self._cache[cacheKey] = tags
+                if len(self._cache) > self._CACHE_SIZE:
+                    self._cache.popitem(last=False)
+
+            if not self._queue.qsize():  # Do not emit results, if having new task
+                self.tagsReady.emit(tags)
+
+    def _parse(self, task):
+        """Get tags with the built-in parser, if enabled, or with ctags.
+
+        Code, which is being edited, is often not valid. Built-in parser fails, ctags is used instead.
+        Ctags is also used for generated code, which is too deep for the ``ast`` module.
+        Return ``None``, if ctags also fails in this case. The previous tags are shown
+        """
+        if not task.useBuiltInParser:
+            return ctags.processText(task.ctagsLang, task.text, task.sortAlphabetically)
+
+        try:
+            tags = _BUILTIN_PARSERS[task.ctagsLang](task.text)
+        except (SyntaxError, ValueError, RecursionError, MemoryError):  # the last ones for generated code
+            try:
+                return ctags.processText(task.ctagsLang, task.text, task.sortAlphabetically)
+            except ctags.FailedException:
+                return None
+
+        if task.sortAlphabetically:
+            tags = ctags.sortTagsAlphabetically(tags)
+        return tags
 
 
 class SettingsWidget(QWidget):
     """Settings widget. Insertted as a page to UISettings
     """
 
-    def __init__(self, *args):
-        QWidget.__init__(self, *args)
+    def __init__(self, dialog):
+        QWidget.__init__(self, dialog)
         uic.loadUi(os.path.join(os.path.dirname(__file__), 'Settings.ui'), self)
         self.pbCtagsPath.clicked.connect(self._onPbCtagsPathClicked)
         self.leCtagsPath.textChanged.connect(self._updateExecuteError)
+        dialog.finished.connect(self._onDialogFinished)
 
     def _onPbCtagsPathClicked(self):
         path, _ = QFileDialog.getOpenFileName(core.mainWindow(), 'Ctags path')
         if path:
             self.leCtagsPath.setText(path)
 
-    def _updateExecuteError(self, path):
-        """ Check if pylint is installed.
+    def _onDialogFinished(self):
+        core.toolRunner().cancel(self)
 
-        Return None if OK or textual error
+    def _updateExecuteError(self, path):
+        """Check ctags version in the background. The previous check is cancelled
         """
+        core.toolRunner().probeAsync(self._onVersionProbed, path, ['--version'], supersedeKey=self)
+
+    def _onVersionProbed(self, future):
         try:
-            stdout, stderr = gco.get_console_output([path, '--version'])
+            stdout, stderr = future.result
         except OSError as ex:
             self.lExecuteError.setText('Failed to execute ctags: {}'.format(ex))
         else:
@@ -169,9 +230,17 @@ class Plugin(QObject):
 
         self._thread = ProcessorThread()
 
+        self._symbolIndex = SymbolIndex()
+        GoToSymbolCommand.symbolIndex = self._symbolIndex
+        core.locator().addCommandClass(GoToSymbolCommand)
+
     def terminate(self):
         """Uninstall the plugin
         """
+        core.locator().removeCommandClass(GoToSymbolCommand)
+        GoToSymbolCommand.symbolIndex = None
+        self._symbolIndex.terminate()
+
         if self._dock is not None:
             self._thread.tagsReady.disconnect(self._dock.setTags)
             self._thread.error.disconnect(self._dock.onError)
@@ -180,6 +249,7 @@ class Plugin(QObject):
         self._typingTimer.stop()
         self._thread.stopAsync()
         self._thread.wait()
+        ctags.terminate()
 
         core.workspace().currentDocumentChanged.disconnect(self._onDocumentChanged)
         core.workspace().textChanged.disconnect(self._onTextChanged)
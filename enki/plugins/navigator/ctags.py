@@ -1,9 +1,15 @@
 """Ctags execution and output parsing functionality
+
+Universal Ctags with the interactive mode is started once per language and parses texts sent through stdin.
+Other ctags versions are executed for every text, which is saved to a temporary file
 """
 
+import json
 import os
+import subprocess
 import sys
 import tempfile
+import threading
 from contextlib import contextmanager
 
 from enki.core.core import core
@@ -24,6 +30,11 @@ class _ParseFailed(UserWarning):
 
 
 class Tag:
+    """Tag tree node.
+
+    ``row`` is an index in the parent's children list. It is maintained by the Navigator model
+    """
+    __slots__ = ('type', 'name', 'lineNumber', 'parent', 'children', 'row')
 
     def __init__(self, type_, name, lineNumber, parent):
         self.type = type_
@@ -31,6 +42,7 @@ class Tag:
         self.lineNumber = lineNumber
         self.parent = parent
         self.children = []
+        self.row = None
 
     def format(self, indentLevel=0):
         indent = '\t' * indentLevel
@@ -72,6 +84,27 @@ def _parseTag(line):
     return name, lineNumber, type_, scopeType, scopeName
 
 
+def _parseJsonTag(obj):
+    """Parse tag from the Universal Ctags interactive mode output
+    """
+    try:
+        name = obj['name']
+        type_ = obj['kind']
+        lineNumber = obj['line'] - 1
+    except (KeyError, TypeError):
+        raise _ParseFailed()
+
+    scopeText = obj.get('scope')
+    if scopeText:
+        scopeType = obj.get('scopeKind')
+        scopeName = scopeText.split(':')[-1].split('.')[-1]
+    else:
+        scopeType = None
+        scopeName = None
+
+    return name, lineNumber, type_, scopeType, scopeName
+
+
 def _findScope(tag, scopeType, scopeName):
     """Check tag and its parents, if theirs name is scopeName.
     Return tag or None
@@ -87,10 +120,41 @@ def _findScope(tag, scopeType, scopeName):
         return None
 
 
+def _parseTagLines(text):
+    """Parse ctags output. Generate (name, lineNumber, type_, scopeType, scopeName)
+    """
+    for line in text.splitlines():
+        if line.startswith('ctags:'):  # warnings from the utility
+            continue
+
+        try:
+            yield _parseTag(line)
+        except _ParseFailed:
+            print('navigator: failed to parse ctags output line "{}"'.format(line), file=sys.stderr)
+
+
 def _parseTags(ctagsLang, text):
     if "Try `ctags --help' for a complete list of options." in text:
         raise FailedException("ctags from Emacs package is used. Use Exuberant Ctags")
 
+    return _buildTags(ctagsLang, _parseTagLines(text))
+
+
+def normalizedTagType(type_):
+    """Tag type, which is shown by the Navigator, for the ctags kind.
+
+    ctags returns parent scope type 'function' for members.
+    Workaround this issue - use one term for functions and members.
+    Built-in parsers use it too, the tags don't change, when the parser is switched
+    """
+    if type_ == 'member':
+        return 'function'
+    return type_
+
+
+def _buildTags(ctagsLang, parsedTags):
+    """Build tag tree from (name, lineNumber, type_, scopeType, scopeName) tuples
+    """
     ignoredTypes = ['variable']
 
     if ctagsLang in ('C', 'C++',):
@@ -98,22 +162,9 @@ def _parseTags(ctagsLang, text):
 
     tags = []
     lastTag = None
-    for line in text.splitlines():
-        if line.startswith('ctags:'):  # warnings from the utility
-            continue
-
-        try:
-            name, lineNumber, type_, scopeType, scopeName = _parseTag(line)
-        except _ParseFailed:
-            print('navigator: failed to parse ctags output line "{}"'.format(line), file=sys.stderr)
-            continue
-
+    for name, lineNumber, type_, scopeType, scopeName in parsedTags:
         if type_ not in ignoredTypes:
-            if type_ == 'member':
-                """ctags returns parent scope type 'function' for members'.
-                Workaround this issue - use one term for functions and members
-                """
-                type_ = 'function'
+            type_ = normalizedTagType(type_)
 
             parent = _findScope(lastTag, scopeType, scopeName)
 
@@ -150,9 +201,135 @@ def _namedTemp():
             pass
 
 
-def _sortTagsAlphabetically(tags):
+class _InteractiveCtags:
+    """Universal Ctags process in the interactive mode.
+
+    Request is a JSON line followed by the text. Response is a JSON line per tag and a completion line
+    """
+
+    def __init__(self, ctagsPath, ctagsLang):
+        self._popen = gco.open_console_output([ctagsPath, '--_interactive', '--sort=no', '--fields=nKs',
+                                               '--language-force={}'.format(ctagsLang)],
+                                              stderr=subprocess.DEVNULL)
+        try:
+            self._readMessage()  # program name and version
+        except OSError:
+            self.terminate()
+            raise
+
+    def isAlive(self):
+        return self._popen.poll() is None
+
+    def terminate(self):
+        try:
+            self._popen.kill()
+        except OSError:  # already dead
+            pass
+        self._popen.wait()
+
+    def _readMessage(self):
+        line = self._popen.stdout.readline()
+        if not line:
+            raise OSError('ctags process has exited')
+        try:
+            return json.loads(line.decode('utf8'))
+        except ValueError:
+            raise OSError('Unexpected ctags output: {}'.format(line))
+
+    def generateTags(self, data):
+        """Parse utf8 data. Return list of (name, lineNumber, type_, scopeType, scopeName).
+
+        Raises OSError, if the process has crashed
+        """
+        request = json.dumps({'command': 'generate-tags',
+                              'filename': 'enki-navigator',
+                              'size': len(data)})
+        self._popen.stdin.write(request.encode('utf8') + b'\n' + data)
+        self._popen.stdin.flush()
+
+        parsedTags = []
+        while True:
+            message = self._readMessage()
+            messageType = message.get('_type')
+            if messageType == 'completed':
+                return parsedTags
+            elif messageType == 'tag':
+                try:
+                    parsedTags.append(_parseJsonTag(message))
+                except _ParseFailed:
+                    print('navigator: failed to parse ctags output "{}"'.format(message), file=sys.stderr)
+            elif messageType == 'error':
+                raise OSError(message.get('message', 'ctags failed'))
+
+
+_interactiveProcesses = {}  # (ctags path, language): _InteractiveCtags
+_interactiveFailed = set()  # (ctags path, language), for which the interactive mode doesn't work
+_interactiveLock = threading.Lock()
+
+
+def _supportsInteractiveMode(ctagsPath):
+    """Check if ctags is Universal Ctags with the interactive mode and JSON output.
+    The tool runner caches the result
+    """
+    try:
+        stdout = core.toolRunner().probe(ctagsPath, ['--list-features'])[0]
+    except OSError:
+        return False
+
+    features = [line.split()[0] for line in stdout.splitlines()
+                if line.strip()]
+    return 'interactive' in features and 'json' in features
+
+
+def _isInteractiveModeFailed(ctagsPath, ctagsLang):
+    with _interactiveLock:
+        return (ctagsPath, ctagsLang) in _interactiveFailed
+
+
+def _generateTagsInteractively(ctagsPath, ctagsLang, data):
+    """Parse data with the running ctags process. Restart the process once, if it has crashed.
+
+    If the second attempt fails too, the language is remembered and
+    :func:`_isInteractiveModeFailed` returns ``True`` for it.
+
+    Raises OSError
+    """
+    key = (ctagsPath, ctagsLang)
+    with _interactiveLock:
+        for attempt in range(2):
+            process = _interactiveProcesses.pop(key, None)
+            try:
+                if process is None or not process.isAlive():
+                    if process is not None:
+                        process.terminate()
+                        process = None
+                    process = _InteractiveCtags(ctagsPath, ctagsLang)
+
+                tags = process.generateTags(data)
+            except OSError:
+                if process is not None:
+                    process.terminate()
+                if attempt:
+                    _interactiveFailed.add(key)
+                    raise
+            else:
+                _interactiveProcesses[key] = process
+                return tags
+
+
+def terminate():
+    """Stop running ctags processes
+    """
+    with _interactiveLock:
+        for process in _interactiveProcesses.values():
+            process.terminate()
+        _interactiveProcesses.clear()
+        _interactiveFailed.clear()
+
+
+def sortTagsAlphabetically(tags):
     for tag in tags:
-        tag.children = _sortTagsAlphabetically(tag.children)
+        tag.children = sortTagsAlphabetically(tag.children)
 
     return sorted(tags, key=lambda tag: tag.name)
 
@@ -165,21 +342,66 @@ def processText(ctagsLang, text, sortAlphabetically):
     # encode to utf8
     data = text.replace('\t', '    ').encode('utf8')
 
+    if _supportsInteractiveMode(ctagsPath) and \
+       not _isInteractiveModeFailed(ctagsPath, ctagsLang):
+        try:
+            parsedTags = _generateTagsInteractively(ctagsPath, ctagsLang, data)
+        except OSError as ex:
+            print('navigator: ctags interactive mode failed: {}'.format(ex), file=sys.stderr)
+        else:
+            return _sortedIfRequired(_buildTags(ctagsLang, parsedTags), sortAlphabetically)
+
     with _namedTemp() as tempFile:
         tempFile.write(data)
         tempFile.close()  # Windows compatibility
 
         try:
-            stdout = gco.get_console_output([ctagsPath,
-                                             '-f', '-', '-u', '--fields=nKs', langArg, tempFile.name])[0]
+            stdout = core.toolRunner().execute([ctagsPath,
+                                                '-f', '-', '-u', '--fields=nKs', langArg, tempFile.name])[0]
         except OSError as ex:
             raise FailedException('Failed to execute ctags console utility "{}": {}\n'
                                   .format(ctagsPath, str(ex)) +
                                   'Go to Settings -> Settings -> Navigator to set path to ctags')
 
-    tags = _parseTags(ctagsLang, stdout)
+    return _sortedIfRequired(_parseTags(ctagsLang, stdout), sortAlphabetically)
+
 
+def _sortedIfRequired(tags, sortAlphabetically):
     if sortAlphabetically:
-        return _sortTagsAlphabetically(tags)
+        return sortTagsAlphabetically(tags)
     else:
         return tags
+
+
+def processFiles(ctagsPath, filePaths, cwd):
+    """Run ctags for a batch of files. Ctags detects languages by file names.
+
+    Return ``{file path: [(name, lineNumber, type_, scopeType, scopeName)]}``.
+    Files without tags are not in the dictionary
+    """
+    # File names are read from stdin. Line numbers instead of search patterns, patterns may contain \t
+    try:
+        with core.toolRunner().toolSlot([ctagsPath]):
+            popen = gco.open_console_output([ctagsPath, '-f', '-', '-u', '--fields=nKs', '--excmd=number', '-L', '-'],
+                                            cwd=cwd, stderr=subprocess.DEVNULL)
+            stdoutBin = popen.communicate('\n'.join(filePaths).encode('utf8'))[0]
+    except OSError as ex:
+        raise FailedException('Failed to execute ctags console utility "{}": {}'.format(ctagsPath, str(ex)))
+
+    stdout = stdoutBin.decode('utf8', 'replace')
+    if "Try `ctags --help' for a complete list of options." in stdout:
+        raise FailedException("ctags from Emacs package is used. Use Exuberant Ctags")
+
+    result = {}
+    for line in stdout.splitlines():
+        items = line.split('\t')
+        if len(items) < 5:  # warnings
+            continue
+
+        try:
+            parsedTag = _parseTag(line)
+        except (_ParseFailed, ValueError):
+            continue
+        result.setdefault(items[1], []).append(parsedTag)
+
+    return result
@@ -2,9 +2,13 @@
 Contains tag model class
 """
 
+import bisect
+import difflib
 import fnmatch
+import functools
+import re
 
-from PyQt5.QtCore import pyqtSignal, Qt, QEvent, QTimer, QAbstractItemModel, QModelIndex
+from PyQt5.QtCore import pyqtSignal, Qt, QEvent, QTimer, QAbstractItemModel, QModelIndex, QSortFilterProxyModel
 from PyQt5.QtWidgets import QApplication, QVBoxLayout, QLabel, QTreeView, QWidget, QStyle
 from PyQt5.QtGui import QBrush, QColor, QIcon
 
@@ -16,13 +20,24 @@ from enki.widgets.lineedit import LineEdit
 from . import ctags
 
 
-def _tagPath(tag):
-    if tag is None:
-        return ''
-    elif tag.parent is None:
-        return tag.name
-    else:
-        return _tagPath(tag.parent) + '.' + tag.name
+def _tagKey(tag):
+    """Tags with equal keys in the same parent are considered the same tag, when the tree is updated
+    """
+    return (tag.name, tag.type)
+
+
+def _copyTag(tag, parent):
+    """Deep copy of the tag
+    """
+    newTag = ctags.Tag(tag.type, tag.name, tag.lineNumber, parent)
+    newTag.children = [_copyTag(child, newTag) for child in tag.children]
+    _setRows(newTag.children)
+    return newTag
+
+
+def _setRows(tags):
+    for row, tag in enumerate(tags):
+        tag.row = row
 
 
 class _TagModel(QAbstractItemModel):
@@ -31,6 +46,8 @@ class _TagModel(QAbstractItemModel):
     def __init__(self, *args):
         QAbstractItemModel.__init__(self, *args)
         self._tags = []
+        self._lineNumbers = None  # sorted line numbers of all tags. Built on demand
+        self._lineTags = None  # tags for self._lineNumbers
 
         self.currentTagIndex = QModelIndex()
 
@@ -48,10 +65,82 @@ class _TagModel(QAbstractItemModel):
         self._updateCurrentTagTimer.stop()
 
     def setTags(self, tags):
-        self.beginResetModel()
-        self._tags = tags
+        """Update the tree.
+
+        The model is not reset. Tags, which present in the old and the new tree, are kept,
+        rows are inserted and removed. The view keeps expanded items and selection.
+
+        The model owns copies of the tags. Passed tags might be shared and are not modified
+        """
+        oldCurrentTag = self.currentTagIndex.internalPointer() if self.currentTagIndex.isValid() else None
+        self.currentTagIndex = QModelIndex()  # might become invalid while merging
+
+        self._mergeTags(QModelIndex(), None, self._tags, tags)
+        self._lineNumbers = None
+        self._lineTags = None
+
         self._updateCurrentTag(False)
-        self.endResetModel()
+        if oldCurrentTag is not None:
+            oldIndex = self._indexForTag(oldCurrentTag)
+            if oldIndex.isValid() and oldIndex != self.currentTagIndex:
+                self.dataChanged.emit(oldIndex, oldIndex)
+        if self.currentTagIndex.isValid():
+            self.dataChanged.emit(self.currentTagIndex, self.currentTagIndex)
+
+    def _mergeTags(self, parentIndex, parentTag, oldTags, newTags):
+        """Update list of own tags ``oldTags`` to match ``newTags``. Emit row insertion and removal signals
+        """
+        oldKeys = [_tagKey(tag) for tag in oldTags]
+        newKeys = [_tagKey(tag) for tag in newTags]
+        if oldKeys == newKeys:  # usual case, when a function body is edited
+            opcodes = [('equal', 0, len(oldTags), 0, len(newTags))]
+        else:
+            opcodes = difflib.SequenceMatcher(None, oldKeys, newKeys, autojunk=False).get_opcodes()
+
+        # From the end, rows before the current opcode are not shifted yet.
+        # Tag.row is updated after all changes, _rowOf() handles outdated values
+        for operation, oldStart, oldEnd, newStart, newEnd in reversed(opcodes):
+            if operation == 'equal':
+                for row, newTag in zip(range(oldStart, oldEnd), newTags[newStart:newEnd]):
+                    oldTag = oldTags[row]
+                    oldTag.lineNumber = newTag.lineNumber
+                    if oldTag.children or newTag.children:
+                        self._mergeTags(self.createIndex(row, 0, oldTag), oldTag,
+                                        oldTag.children, newTag.children)
+            else:
+                if oldEnd > oldStart:
+                    self.beginRemoveRows(parentIndex, oldStart, oldEnd - 1)
+                    del oldTags[oldStart:oldEnd]
+                    self.endRemoveRows()
+                if newEnd > newStart:
+                    self.beginInsertRows(parentIndex, oldStart, oldStart + newEnd - newStart - 1)
+                    oldTags[oldStart:oldStart] = [_copyTag(tag, parentTag) for tag in newTags[newStart:newEnd]]
+                    self.endInsertRows()
+
+        if len(opcodes) > 1 or opcodes[0][0] != 'equal':
+            _setRows(oldTags)
+
+    def _rowOf(self, tag):
+        """Row of the tag in its parent. Raises ValueError, if the tag is not in the tree
+        """
+        siblings = tag.parent.children if tag.parent is not None else self._tags
+        row = tag.row
+        if row is None or row >= len(siblings) or siblings[row] is not tag:  # while rows are being updated
+            row = siblings.index(tag)
+        return row
+
+    def _indexForTag(self, tag):
+        """Index of the tag or invalid index, if the tag has been removed from the tree
+        """
+        try:
+            row = self._rowOf(tag)
+        except ValueError:
+            return QModelIndex()
+
+        if tag.parent is not None and not self._indexForTag(tag.parent).isValid():
+            return QModelIndex()
+
+        return self.createIndex(row, 0, tag)
 
     def _onCursorPositionChanged(self):
         """If position is updated on every key pressing - cursor movement might be slow
@@ -104,16 +193,10 @@ class _TagModel(QAbstractItemModel):
         tag = index.internalPointer()
         if tag.parent is not None:
             parent = tag.parent
-            if parent.parent:
-                try:
-                    row = parent.parent.children.index(parent)
-                except ValueError:
-                    return QModelIndex()
-            else:
-                try:
-                    row = self._tags.index(parent)
-                except ValueError:
-                    return QModelIndex()
+            try:
+                row = self._rowOf(parent)
+            except ValueError:
+                return QModelIndex()
 
             return self.createIndex(row, 0, parent)
         else:
@@ -155,103 +238,121 @@ class _TagModel(QAbstractItemModel):
             core.workspace().focusCurrentDocument()
             self.jumpToTagDone.emit()
 
-    def tagPathForIndex(self, index):
-        tag = index.internalPointer()
-        return _tagPath(tag)
-
-    def indexForTagPath(self, tagPath):
-        def findTag(tagList, name):
-            for tag in tagList:
-                if tag.name == name:
-                    return tag
-            else:
-                return None
+    def allTags(self):
+        """Generate all tags in the tree order
+        """
+        def recursiveTagGenerator(tags):
+            for tag in tags:
+                yield tag
+                yield from recursiveTagGenerator(tag.children)
 
-        def findPath(currentTag, childTags, parts):
-            if not parts:
-                return currentTag
+        return recursiveTagGenerator(self._tags)
 
-            part = parts[0]
-            tag = findTag(childTags, part)
-            if tag is not None:
-                return findPath(tag, tag.children, parts[1:])
-            else:
-                return currentTag
+    def _buildLineIndex(self):
+        """Sort all tags by line number. Tags on the same line keep the tree order
+        """
+        self._lineTags = sorted(self.allTags(), key=lambda tag: tag.lineNumber)
+        self._lineNumbers = [tag.lineNumber for tag in self._lineTags]
 
-        parts = tagPath.split('.')
-        tag = findPath(None, self._tags, parts)
-        if tag is not None:
-            row = tag.parent.children.index(tag) if tag.parent else self._tags.index(tag)
-            return self.createIndex(row, 0, tag)
+    def _indexForLineNumber(self, number):
+        """Index of the tag on the line or the nearest tag above the line
+        """
+        if self._lineNumbers is None:
+            self._buildLineIndex()
+
+        position = bisect.bisect_left(self._lineNumbers, number)
+        if position < len(self._lineNumbers) and \
+           self._lineNumbers[position] == number:
+            tag = self._lineTags[position]
+        elif position > 0:
+            tag = self._lineTags[position - 1]
         else:
             return QModelIndex()
 
-    def _indexForLineNumber(self, number):
+        return self.createIndex(self._rowOf(tag), 0, tag)
 
-        def recursiveTagGenerator(tags):
-            for childRow, childTag in enumerate(tags):
-                yield childRow, childTag
-                for gcRow, grandChild in recursiveTagGenerator(childTag.children):
-                    yield gcRow, grandChild
-
-        prevRow, prevTag = None, None
-        for row, tag in recursiveTagGenerator(self._tags):
-            if tag.lineNumber == number:
-                return self.createIndex(row, 0, tag)
-            elif tag.lineNumber > number and \
-                    prevTag is not None and \
-                    prevTag.lineNumber <= number:
-                return self.createIndex(prevRow, 0, prevTag)
-            else:
-                prevRow, prevTag = row, tag
-        else:
-            if prevTag is not None and \
-               prevTag.lineNumber <= number:  # the last tag is current
-                return self.createIndex(prevRow, 0, prevTag)
 
-        return QModelIndex()
+@functools.lru_cache(maxsize=64)
+def _compileWildcard(wildcard):
+    return re.compile(fnmatch.translate(wildcard))
+
 
+class _TagFilterModel(QSortFilterProxyModel):
+    """Proxy model, which shows tags matching the filter text and their parents.
 
-def _filterTag(wildcard, tag, parent):
-    """Filter tag by returning NEW tag, which matches the filter.
-    Original tag is not modified
+    If the new text extends the previous one, only tags, which matched the previous text, are checked
     """
-    newTag = ctags.Tag(tag.type, tag.name, tag.lineNumber, parent)
 
-    children = _filterTags(wildcard, tag.children, newTag)
+    def __init__(self, *args):
+        QSortFilterProxyModel.__init__(self, *args)
+        self._text = ''
+        self._matchingTags = None  # None if not filtered
+        self._acceptedTags = None  # matching tags and their parents
+
+    def setFilterText(self, text):
+        """Show tags, which names match ``*text*`` wildcard. Case insensitive.
+        Empty text shows all tags
+        """
+        if not text:
+            self._text = ''
+            self._matchingTags = None
+            self._acceptedTags = None
+            self.invalidateFilter()
+            return
+
+        wildcard = text.lower()
+        if not wildcard.startswith('*'):
+            wildcard = '*' + wildcard
+        if not wildcard.endswith('*'):
+            wildcard = wildcard + '*'
+        regExp = _compileWildcard(wildcard)
+
+        # '[' starts a set. Extended text might close it and match other names
+        if self._matchingTags is not None and \
+           text.startswith(self._text) and \
+           '[' not in self._text:
+            candidates = self._matchingTags
+        else:
+            candidates = self.sourceModel().allTags()
+
+        self._text = text
+        self._matchingTags = [tag for tag in candidates
+                              if regExp.match(tag.name.lower())]
 
-    if children or fnmatch.fnmatch(tag.name.lower(), wildcard):
-        newTag.children = children
-        return newTag
-    else:
-        return None
+        self._acceptedTags = set()
+        for tag in self._matchingTags:
+            while tag is not None and tag not in self._acceptedTags:
+                self._acceptedTags.add(tag)
+                tag = tag.parent
 
+        self.invalidateFilter()
 
-def _filterTags(wildcard, tags, parent=None):
-    """Filter tags by returning list of NEW tags,
-    which match filter.
-    Original tags are not modified
-    """
-    res = []
-    for tag in tags:
-        filteredTag = _filterTag(wildcard, tag, parent)
-        if filteredTag is not None:
-            res.append(filteredTag)
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        if self._acceptedTags is None:
+            return True
 
-    return res
+        index = self.sourceModel().index(sourceRow, 0, sourceParent)
+        return index.internalPointer() in self._acceptedTags
+
+    def firstMatchingIndex(self):
+        """Index of the first tag, which matches the filter, in the tree order
+        """
+        if not self._matchingTags:
+            return QModelIndex()
 
+        matchingTags = set(self._matchingTags)
 
-def _findFirstMatching(wildcard, filteredTags):
-    """Find first tag, which matches whildcard.
-    It is assumed, that tags are filtered and not empty
-    """
-    assert filteredTags
-    firstTag = filteredTags[0]
+        def findIndex(parent):
+            for row in range(self.rowCount(parent)):
+                index = self.index(row, 0, parent)
+                if self.mapToSource(index).internalPointer() in matchingTags:
+                    return index
+                childIndex = findIndex(index)
+                if childIndex.isValid():
+                    return childIndex
+            return QModelIndex()
 
-    if fnmatch.fnmatch(firstTag.name.lower(), wildcard):
-        return firstTag
-    else:
-        return _findFirstMatching(wildcard, firstTag.children)
+        return findIndex(QModelIndex())
 
 
 class NavigatorDock(DockWidget):
@@ -260,8 +361,6 @@ class NavigatorDock(DockWidget):
         icon = core.mainWindow().style().standardIcon(getattr(QStyle, "SP_FileDialogDetailedView"))
         DockWidget.__init__(self, core.mainWindow(), '&Navigator', icon, "Alt+N")
 
-        self._tags = []
-
         self._tree = QTreeView(self)
         self._tree.installEventFilter(self)
         self._tree.setHeaderHidden(True)
@@ -286,15 +385,15 @@ class NavigatorDock(DockWidget):
         self._tagModel = _TagModel(self._tree)
         self._tagModel.jumpToTagDone.connect(self._hideFilter)
 
-        self._tree.setModel(self._tagModel)
-        self._tree.activated.connect(self._tagModel.onActivated)
-        self._tree.clicked.connect(self._tagModel.onActivated)
-        self._tagModel.modelAboutToBeReset.connect(self._onModelAboutToBeReset)
-        self._tagModel.modelReset.connect(self._onModelReset)
+        self._filterModel = _TagFilterModel(self._tree)
+        self._filterModel.setSourceModel(self._tagModel)
 
-        self._showAction.triggered.connect(self._onShowTriggered)
+        self._tree.setModel(self._filterModel)
+        self._tree.activated.connect(self._onTreeItemActivated)
+        self._tree.clicked.connect(self._onTreeItemActivated)
+        self._filterModel.rowsInserted.connect(self._onRowsInserted)
 
-        self._currentTagPath = None
+        self._showAction.triggered.connect(self._onShowTriggered)
 
         self._errorLabel = None
 
@@ -317,9 +416,8 @@ class NavigatorDock(DockWidget):
             self._installed = False
 
     def setTags(self, tags):
-        self._tags = tags
-        self._setFilteredTags(tags)
         self._hideFilter()
+        self._tagModel.setTags(tags)
 
         if self.widget() is not self._displayWidget:
             self.setWidget(self._displayWidget)
@@ -327,9 +425,6 @@ class NavigatorDock(DockWidget):
         if self._errorLabel is not None:
             self._errorLabel.hide()
 
-    def _setFilteredTags(self, tags):
-        self._tagModel.setTags(tags)
-
     def onError(self, error):
         self._displayWidget.hide()
         if self._errorLabel is None:
@@ -343,18 +438,23 @@ class NavigatorDock(DockWidget):
             self._errorLabel.show()
             self._displayWidget.hide()
 
-    def _onModelAboutToBeReset(self):
-        currIndex = self._tree.currentIndex()
-        self._currentTagPath = self._tagModel.tagPathForIndex(currIndex) if currIndex.isValid() else None
+    def _onRowsInserted(self, parent, first, last):
+        """Expand new tags. Existing tags keep their state
+        """
+        if parent.isValid():  # might have had no visible children
+            self._tree.expand(parent)
+        for row in range(first, last + 1):
+            self._expandRecursively(self._filterModel.index(row, 0, parent))
 
-    def _onModelReset(self):
-        self._tree.expandAll()
+    def _expandRecursively(self, index):
+        childCount = self._filterModel.rowCount(index)
+        if childCount:
+            self._tree.expand(index)
+            for row in range(childCount):
+                self._expandRecursively(self._filterModel.index(row, 0, index))
 
-        # restore current item
-        if self._currentTagPath is not None:
-            index = self._tagModel.indexForTagPath(self._currentTagPath)
-            if index.isValid():
-                self._tree.setCurrentIndex(index)
+    def _onTreeItemActivated(self, index):
+        self._tagModel.onActivated(self._filterModel.mapToSource(index))
 
     def eventFilter(self, object_, event):
         if object_ is self._tree:
@@ -378,7 +478,7 @@ class NavigatorDock(DockWidget):
                 elif event.key() in (Qt.Key_Enter, Qt.Key_Return):
                     currIndex = self._tree.currentIndex()
                     if currIndex.isValid():
-                        self._tagModel.onActivated(currIndex)
+                        self._onTreeItemActivated(currIndex)
 
         return DockWidget.eventFilter(self, object_, event)
 
@@ -391,27 +491,11 @@ class NavigatorDock(DockWidget):
 
     def _applyFilter(self):
         text = self._filterEdit.text()
+        self._filterModel.setFilterText(text)
         if text:
-            if not text.startswith('*'):
-                text = '*' + text
-            if not text.endswith('*'):
-                text = text + '*'
-
-            wildcard = text.lower()
-
-            filteredTags = _filterTags(wildcard, self._tags)
-
-            self._setFilteredTags(filteredTags)
-            self._tree.expandAll()
-            if filteredTags:
-                firstMatchingTag = _findFirstMatching(wildcard, filteredTags)
-                path = _tagPath(firstMatchingTag)
-                index = self._tagModel.indexForTagPath(path)
+            index = self._filterModel.firstMatchingIndex()
+            if index.isValid():
                 self._tree.setCurrentIndex(index)
-        else:
-            self._setFilteredTags(self._tags)
-
-        if text:
             self._filterEdit.show()
         elif not self._filterEdit.hasFocus():
             self._hideFilter()
@@ -432,4 +516,4 @@ class NavigatorDock(DockWidget):
 
     def _onShowTriggered(self):
         if self._tagModel.currentTagIndex.isValid():
-            self._tree.setCurrentIndex(self._tagModel.currentTagIndex)
+            self._tree.setCurrentIndex(self._filterModel.mapFromSource(self._tagModel.currentTagIndex))
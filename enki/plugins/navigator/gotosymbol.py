@@ -0,0 +1,179 @@
+"""
+gotosymbol --- Locator command, which fuzzy searches symbols of all project files
+=================================================================================
+"""
+
+import copy
+import os.path
+
+from enki.core.core import core
+from enki.core.locator import AbstractCommand, AbstractCompleter, StatusCompleter, InvalidCmdArgs
+from enki.lib.fuzzymatch import indexesToRanges, scoreFiles
+from enki.lib.htmldelegate import htmlEscape
+
+
+_MAX_COUNT = 32
+
+
+class _SymbolMatcherState:
+    """Remembers which symbols matched the previous pattern.
+    If the new pattern extends the previous one, only the previous survivors are matched again.
+
+    Used only by the completer loader thread
+    """
+
+    def __init__(self):
+        self._table = None
+        self._pattern = None
+        self._caseSensitive = False
+        self._survivors = None
+
+    def candidates(self, table, pattern, caseSensitive):
+        candidates = range(len(table.names))
+        if table is self._table and \
+           caseSensitive == self._caseSensitive and \
+           pattern.startswith(self._pattern):
+            candidates = self._survivors
+
+        return table.charMaskIndex.filter(pattern, candidates)
+
+    def setSurvivors(self, table, pattern, caseSensitive, survivors):
+        self._table = table
+        self._pattern = pattern
+        self._caseSensitive = caseSensitive
+        self._survivors = survivors
+
+
+class GoToSymbolCompleter(AbstractCompleter):
+
+    mustBeLoaded = True
+
+    def __init__(self, pattern, table, tableVersion, matcherState):
+        self._pattern = pattern
+        self._table = table
+        self._cacheKey = (pattern, core.project().path(), tableVersion)
+        self._matcherState = matcherState
+        self._items = []  # (symbol index, score, matching indexes)
+
+    def cacheKey(self):
+        return self._cacheKey
+
+    def load(self, stopEvent):
+        caseSensitive = any([c.isupper() for c in self._pattern])
+        if caseSensitive:
+            pattern = self._pattern
+            names = self._table.names
+        else:
+            pattern = self._pattern.lower()
+            names = self._table.lowerNames
+
+        candidates = self._matcherState.candidates(self._table, pattern, caseSensitive)
+
+        def onProgress(getTop):
+            self.publishPartialResult(lambda: self._partialCompleter(self._makeItems(getTop())))
+
+        result = scoreFiles(pattern[::-1], names, candidates, set(), _MAX_COUNT, stopEvent, onProgress)
+        if result is None:  # stopped
+            return
+
+        survivors, top = result
+        self._matcherState.setSurvivors(self._table, pattern, caseSensitive, survivors)
+        self._items = self._makeItems(top)
+
+    @staticmethod
+    def _makeItems(top):
+        return [(index, score, indexes) for score, index, indexes in top]
+
+    def _partialCompleter(self, items):
+        partial = copy.copy(self)
+        partial._items = items
+        return partial
+
+    def _location(self, row):
+        index = self._items[row][0]
+        path, lineNumber, type_, scopeName = self._table.symbols[index]
+        description = type_
+        if scopeName:
+            description += ' in ' + scopeName
+        return '{}:{}  {}'.format(path, lineNumber + 1, description)
+
+    def rowCount(self):
+        return len(self._items)
+
+    def columnCount(self):
+        return 1
+
+    def text(self, row, column):
+        index, score, indexes = self._items[row]
+        name = self._table.names[index]
+        nameFormatted = ''.join(['<b>{}</b>'.format(htmlEscape(char)) if charIndex in indexes else htmlEscape(char)
+                                 for charIndex, char in enumerate(name)])
+        return '{}<div style="margin: 15px">{}</div>'.format(nameFormatted, htmlEscape(self._location(row)))
+
+    def highlightedText(self, row, column):
+        index, score, indexes = self._items[row]
+        return [(self._table.names[index], indexesToRanges(indexes)),
+                (self._location(row), [])]
+
+    def autoSelectItem(self):
+        return (0, 0)
+
+    def getFullText(self, row):
+        """Symbol location as ``path:line``
+        """
+        index = self._items[row][0]
+        path, lineNumber, type_, scopeName = self._table.symbols[index]
+        return '{}:{}'.format(path, lineNumber + 1)
+
+
+class GoToSymbolCommand(AbstractCommand):
+    command = 'sym'
+    signature = 'sym NAME'
+    description = 'Go to symbol in project. Fuzzy match the name'
+
+    symbolIndex = None  # enki.plugins.navigator.symbolindex.SymbolIndex, set by the plugin
+
+    @staticmethod
+    def isAvailable():
+        return core.project().path() is not None
+
+    def __init__(self):
+        AbstractCommand.__init__(self)
+        self._clickedLocation = None
+        self._matcherState = _SymbolMatcherState()
+
+        self.symbolIndex.changed.connect(self.updateCompleter)
+        self.symbolIndex.update()
+
+    def terminate(self):
+        self.symbolIndex.changed.disconnect(self.updateCompleter)
+
+    def onDialogShown(self):
+        """Index files, which have been modified since the previous invocation
+        """
+        self._clickedLocation = None
+        self.symbolIndex.update()
+
+    def setArgs(self, args):
+        if len(args) > 1:
+            raise InvalidCmdArgs()
+
+        self._pattern = args[0] if args else ''
+
+    def completer(self):
+        table = self.symbolIndex.table()
+        if table is not None and self._pattern:
+            return GoToSymbolCompleter(self._pattern, table, self.symbolIndex.tableVersion(),
+                                       self._matcherState)
+        else:
+            return StatusCompleter("<i>{}</i>".format(self.symbolIndex.status()))
+
+    def onItemClicked(self, fullText):
+        self._clickedLocation = fullText
+
+    def isReadyToExecute(self):
+        return self._clickedLocation is not None
+
+    def execute(self):
+        path, line = self._clickedLocation.rsplit(':', 1)
+        core.workspace().goTo(os.path.join(core.project().path(), path), line=int(line) - 1)
@@ -0,0 +1,64 @@
+"""Built-in Python tags parser.
+
+Parses the text with the ``ast`` module in the Navigator thread. Produces the same tag tree as ctags
+"""
+
+import ast
+
+from .ctags import normalizedTagType, Tag
+
+
+# Fields of compound statements, which contain statements, i.e. if, for, try, with, match. In the source order.
+# Definitions in these blocks belong to the enclosing class or function
+_BLOCK_FIELDS = ('body', 'handlers', 'orelse', 'finalbody', 'cases')
+
+
+def _tagType(node, parent):
+    """ctags kind of the definition, or None
+    """
+    if isinstance(node, ast.ClassDef):
+        return 'class'
+    elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        if parent is not None and parent.type == 'class':
+            return 'member'
+        else:
+            return 'function'
+    else:
+        return None
+
+
+def _collectTags(statements):
+    """Walk the statements without recursion. Generated code might be nested too deeply
+    """
+    tags = []
+    stack = [(iter(statements), None, tags)]  # (statements, parent tag, list of the parent children)
+    while stack:
+        nodes, parent, siblings = stack[-1]
+        node = next(nodes, None)
+        if node is None:
+            stack.pop()
+            continue
+
+        type_ = _tagType(node, parent)
+        if type_ is None:
+            blocks = [getattr(node, field, None) for field in _BLOCK_FIELDS]
+            for block in reversed(blocks):  # the first block is walked first
+                if block:
+                    stack.append((iter(block), parent, siblings))
+            continue
+
+        tag = Tag(normalizedTagType(type_), node.name, node.lineno - 1, parent)
+        siblings.append(tag)
+        stack.append((iter(node.body), tag, tag.children))
+
+    return tags
+
+
+def processText(text):
+    """Get tags for the Python source code.
+
+    Raises ``SyntaxError`` or ``ValueError``, if the text is not valid Python code,
+    and ``RecursionError``, if it is nested too deeply for the ``ast`` module
+    """
+    tree = ast.parse(text)
+    return _collectTags(tree.body)
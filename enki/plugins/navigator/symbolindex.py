@@ -0,0 +1,292 @@
+"""
+symbolindex --- Index of symbols of all project files
+=====================================================
+
+Project files are processed with ctags in batches in a background thread.
+The index is saved to the configuration directory. Next time only new and modified files are processed
+"""
+
+import hashlib
+import json
+import os
+import os.path
+import threading
+import time
+
+from PyQt5.QtCore import pyqtSignal, QObject, QThread
+
+from enki.core.core import core
+import enki.core.defines
+from enki.lib.fuzzymatch import CharMaskIndex
+
+from . import ctags
+
+
+_INDEX_DIR = os.path.join(enki.core.defines.CONFIG_DIR, 'symbol_index')
+_INDEX_FORMAT_VERSION = 1
+
+_BATCH_SIZE = 200  # files per ctags execution
+_STATUS_UPDATE_TIMEOUT_SEC = 0.25
+
+_IGNORED_TYPES = ('variable', 'local')
+
+
+def _indexFilePath(projectPath):
+    name = hashlib.sha1(projectPath.encode('utf8', 'surrogatepass')).hexdigest()
+    return os.path.join(_INDEX_DIR, name + '.json')
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class SymbolTable:
+    """Symbols of the project, prepared for fuzzy matching.
+
+    Public attributes:
+
+    * ``names`` - symbol names
+    * ``lowerNames`` - lowercased symbol names
+    * ``symbols`` - ``(relative file path, line number, type, scope name)`` for every name
+    * ``charMaskIndex`` - :class:`enki.lib.fuzzymatch.CharMaskIndex` for the names
+    * ``fileEntries`` - ``{relative file path: [mtime, [[name, line number, type, scope name], ...]]}``
+
+    The table is not modified after construction and is shared between threads
+    """
+
+    def __init__(self, projectPath, fileEntries):
+        self.projectPath = projectPath
+        self.fileEntries = fileEntries
+        self.names = []
+        self.symbols = []
+        for path, (mtime, fileSymbols) in fileEntries.items():
+            for name, lineNumber, type_, scopeName in fileSymbols:
+                self.names.append(name)
+                self.symbols.append((path, lineNumber, type_, scopeName))
+
+        self.lowerNames = [name.lower() for name in self.names]
+        self.charMaskIndex = CharMaskIndex(self.names)
+        self.charMaskIndex.build(threading.Event())
+
+
+class _IndexerThread(QThread):
+    """Check project files modification time and process new and modified files with ctags
+    """
+    status = pyqtSignal(str)
+    tableReady = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, parent, projectPath, files, ctagsPath, currentTable):
+        QThread.__init__(self, parent)
+        self._projectPath = projectPath
+        self._files = files
+        self._ctagsPath = ctagsPath
+        self._currentTable = currentTable
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def _loadIndexFile(self):
+        try:
+            with open(_indexFilePath(self._projectPath), encoding='utf8') as indexFile:
+                data = json.load(indexFile)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get('version') != _INDEX_FORMAT_VERSION or \
+           data.get('projectPath') != self._projectPath or \
+           data.get('ctagsPath') != self._ctagsPath:
+            return {}
+
+        return data.get('files', {})
+
+    def _saveIndexFile(self, fileEntries):
+        data = {'version': _INDEX_FORMAT_VERSION,
+                'projectPath': self._projectPath,
+                'ctagsPath': self._ctagsPath,
+                'files': fileEntries}
+        path = _indexFilePath(self._projectPath)
+        tmpPath = '{}.{}.tmp'.format(path, threading.get_ident())  # a stopped thread might be saving too
+        try:
+            os.makedirs(_INDEX_DIR, exist_ok=True)
+            with open(tmpPath, 'w', encoding='utf8') as indexFile:
+                json.dump(data, indexFile, separators=(',', ':'))
+            os.replace(tmpPath, path)
+        except OSError as ex:
+            self.error.emit('Failed to save symbol index {}: {}'.format(path, ex))
+
+    def run(self):
+        if self._currentTable is not None:
+            oldEntries = self._currentTable.fileEntries
+        else:
+            oldEntries = self._loadIndexFile()
+
+        fileEntries = {}
+        modifiedFiles = []  # (path, mtime)
+        for checkedCount, path in enumerate(self._files):
+            if not (checkedCount % 1000) and self._stop:
+                return
+
+            mtime = _mtime(os.path.join(self._projectPath, path))
+            if mtime is None:
+                continue
+
+            entry = oldEntries.get(path)
+            if entry is not None and entry[0] == mtime:
+                fileEntries[path] = entry
+            else:
+                modifiedFiles.append((path, mtime))
+
+        isModified = modifiedFiles or len(fileEntries) != len(oldEntries)
+        if not isModified and self._currentTable is not None:
+            self.status.emit('{} symbols indexed'.format(len(self._currentTable.names)))
+            return
+
+        lastUpdateTime = time.time()
+        for batchStart in range(0, len(modifiedFiles), _BATCH_SIZE):
+            if self._stop:
+                break
+
+            if time.time() - lastUpdateTime > _STATUS_UPDATE_TIMEOUT_SEC:
+                self.status.emit('Indexing symbols: {} of {} files'.format(batchStart, len(modifiedFiles)))
+                lastUpdateTime = time.time()
+
+            batch = modifiedFiles[batchStart:batchStart + _BATCH_SIZE]
+            try:
+                tags = ctags.processFiles(self._ctagsPath, [path for path, mtime in batch], self._projectPath)
+            except ctags.FailedException as ex:
+                self.error.emit(ex.args[0])
+                return
+
+            for path, mtime in batch:
+                fileSymbols = [[name, lineNumber, type_, scopeName]
+                               for name, lineNumber, type_, scopeType, scopeName in tags.get(path, [])
+                               if type_ not in _IGNORED_TYPES]
+                fileEntries[path] = [mtime, fileSymbols]
+
+        # Not processed files are not saved if stopped. They will be processed next time
+        if isModified:
+            self._saveIndexFile(fileEntries)
+
+        if not self._stop:
+            table = SymbolTable(self._projectPath, fileEntries)
+            self.status.emit('{} symbols indexed'.format(len(table.names)))
+            self.tableReady.emit(table)
+
+
+class SymbolIndex(QObject):
+    """Symbols of all project files.
+
+    Indexing starts, when the index is used first time, and is repeated, when project files are rescanned
+    """
+
+    changed = pyqtSignal()
+    """
+    changed()
+
+    **Signal** emitted, when the symbol table or the status has changed
+    """
+
+    def __init__(self):
+        QObject.__init__(self)
+        self._table = None
+        self._tableVersion = 0
+        self._status = 'Symbols are not indexed'
+        self._thread = None
+        self._stoppedThreads = []  # not finished yet
+        self._isUsed = False
+
+        core.project().changed.connect(self._onProjectChanged)
+        core.project().filesReady.connect(self._onFilesReady)
+
+    def terminate(self):
+        core.project().changed.disconnect(self._onProjectChanged)
+        core.project().filesReady.disconnect(self._onFilesReady)
+        self._stopThread()
+        for thread in self._stoppedThreads:
+            thread.wait()
+        self._stoppedThreads = []
+
+    def table(self):
+        """Current :class:`SymbolTable` or ``None``, if not indexed yet
+        """
+        return self._table
+
+    def tableVersion(self):
+        """Incremented every time the table is replaced
+        """
+        return self._tableVersion
+
+    def status(self):
+        """Indexing status as a readable text
+        """
+        return self._status
+
+    def update(self):
+        """Index new and modified project files in the background.
+
+        Project files are loaded, if not loaded yet. It is allowed to call this method multiple times
+        """
+        self._isUsed = True
+        if core.project().files() is None:
+            self._setStatus('Waiting for the list of project files')
+            core.project().startLoadingFiles()
+        elif self._thread is None:
+            self._startThread()
+
+    def _startThread(self):
+        assert self._thread is None
+        self._thread = _IndexerThread(self, core.project().path(), core.project().files(),
+                                      core.config()['Navigator']['CtagsPath'], self._table)
+        self._thread.status.connect(self._setStatus)
+        self._thread.error.connect(self._setStatus)
+        self._thread.tableReady.connect(self._onTableReady)
+        self._thread.finished.connect(self._onThreadFinished)
+        self._thread.start(QThread.LowPriority)
+
+    def _stopThread(self):
+        """Stop the thread, but don't wait for it. Running ctags batch can't be interrupted.
+        The thread finishes in the background, its results are ignored
+        """
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread.status.disconnect(self._setStatus)
+            self._thread.error.disconnect(self._setStatus)
+            self._thread.tableReady.disconnect(self._onTableReady)
+            self._thread.finished.disconnect(self._onThreadFinished)
+            self._stoppedThreads.append(self._thread)
+            self._thread = None
+
+        for thread in self._stoppedThreads[:]:
+            if thread.isFinished():
+                self._stoppedThreads.remove(thread)
+                thread.deleteLater()
+
+    def _onThreadFinished(self):
+        if self.sender() is self._thread:  # not a thread, which has been already replaced
+            self._stopThread()
+
+    def _setStatus(self, text):
+        self._status = text
+        self.changed.emit()
+
+    def _onTableReady(self, table):
+        if table.projectPath == core.project().path():
+            self._table = table
+            self._tableVersion += 1
+            self.changed.emit()
+
+    def _onProjectChanged(self, path):
+        self._stopThread()
+        self._table = None
+        self._tableVersion += 1
+        self._setStatus('Symbols are not indexed')
+
+    def _onFilesReady(self):
+        if self._isUsed:
+            self._stopThread()
+            self._startThread()
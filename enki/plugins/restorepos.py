@@ -54,6 +54,10 @@ class Plugin:
         if document.filePath() is None:
             return
 
+        if not document.isLoaded():
+            document.loaded.connect(lambda: self._onDocumentOpened(document))
+            return
+
         if document.filePath() in self._positions:
             time, pos = self._positions[document.filePath()]
             if pos <= len(document.qutepart.text):
@@ -63,7 +67,7 @@ class Plugin:
         """Document has been closed. Save position
         """
         path = document.filePath()
-        if path is not None:
+        if path is not None and document.isLoaded():
             absPos = document.qutepart.absCursorPosition
             if absPos != 0:
                 self._positions[document.filePath()] = (time.time(), document.qutepart.absCursorPosition)
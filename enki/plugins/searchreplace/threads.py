@@ -67,14 +67,14 @@ class SearchThread(StopableThread):
         self._inOpenedFiles = inOpenedFiles
         self._searchPath = searchPath
 
-        self._openedFiles = {}
+        self._openedFiles = {}  # path: text. None, if the document is not loaded yet
         for document in core.workspace().documents():
             if document.filePath() is not None:
-                self._openedFiles[document.filePath()] = document.qutepart.text
+                self._openedFiles[document.filePath()] = document.qutepart.text if document.isLoaded() else None
 
         self.start()
 
-    def _getFiles(self, path, maskRegExp, filterRegExp):
+    def _getFiles(self, path, maskRegExp, fileMatcher):
         """Get recursive list of files from directory.
         maskRegExp is regExp object for check if file matches mask
         """
@@ -92,7 +92,7 @@ class SearchThread(StopableThread):
 
                 # remove not interesting directories
                 for dirname in dirs[:]:
-                    if filterRegExp.match(dirname):
+                    if fileMatcher.isIgnored(dirname):
                         dirs.remove(dirname)
 
                 for fileName in files:
@@ -101,7 +101,7 @@ class SearchThread(StopableThread):
                     if maskRegExp and not maskRegExp.match(fileName):
                         continue
 
-                    if filterRegExp.match(fileName):
+                    if fileMatcher.isIgnored(fileName):
                         continue
 
                     fullPath = os.path.join(root, fileName)
@@ -137,12 +137,12 @@ class SearchThread(StopableThread):
             return files
         else:
             path = self._searchPath
-            return self._getFiles(path, maskRegExp, core.fileFilter().regExp())
+            return self._getFiles(path, maskRegExp, core.fileFilter().matcher())
 
     def _fileContent(self, fileName):
         """Read text from file
         """
-        if fileName in self._openedFiles:
+        if self._openedFiles.get(fileName) is not None:
             return self._openedFiles[fileName]
 
         try:
@@ -261,6 +261,11 @@ class ReplaceThread(StopableThread):
     def _replaceInOpenedDocument(self, document, matches):
         """Do replacements in opened document
         """
+        try:
+            document.waitForLoaded()
+        except (OSError, IOError):  # failed to load, the document has been closed
+            return
+
         pos = document.qutepart.cursorPosition
         oldText = document.qutepart.text
         document.qutepart.text = self._doReplacements(document.qutepart.text, matches)
@@ -71,9 +71,9 @@ class Plugin:
         session = enki.core.json_wrapper.load(_SESSION_FILE_PATH, 'session', None)
 
         if session is not None:
-            for filePath in session['opened']:
-                if os.path.exists(filePath):
-                    core.workspace().openFile(filePath)
+            # Documents are loaded, when activated, or in idle time. Files, which failed to open, are skipped
+            existingFiles = [filePath for filePath in session['opened'] if os.path.isfile(filePath)]
+            core.workspace().openFiles(existingFiles, deferLoading=True, stopOnError=False)
 
             if session['current'] is not None:
                 document = self._documentForPath(session['current'])
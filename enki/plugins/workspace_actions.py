@@ -140,7 +140,7 @@ class Plugin(QObject):
         try:
             QApplication.setOverrideCursor(Qt.WaitCursor)
             document.reload()
-        except IOError as ex:
+        except (OSError, IOError) as ex:  # if the file wasn't loaded yet, the document has been closed
             QMessageBox.critical(None,
                                  self.tr("File not reloaded"),
                                  str(ex))
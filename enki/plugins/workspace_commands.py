@@ -4,10 +4,9 @@ workspace_commands --- Open, SaveAs, GotoLine commands
 """
 
 import os.path
-import glob
 
 from enki.core.core import core
-from enki.lib.pathcompleter import makeSuitableCompleter, PathCompleter
+from enki.lib.pathcompleter import makeSuitableCompleter, GlobCompleter, PathCompleter
 
 from enki.core.locator import AbstractCommand, InvalidCmdArgs, StatusCompleter
 
@@ -96,6 +95,8 @@ class CommandOpen(AbstractCommand):
         else:
             self._line = None
 
+        self._expandedFiles = None  # set when GlobCompleter has been loaded
+
     def completer(self):
         """Command completer.
         If cursor is after path, returns PathCompleter or GlobCompleter
@@ -109,6 +110,12 @@ class CommandOpen(AbstractCommand):
                 return None
             return makeSuitableCompleter(curDir + '/')
 
+    def onCompleterLoaded(self, completer):
+        """GlobCompleter has expanded the glob in the background. Remember the files
+        """
+        if isinstance(completer, GlobCompleter):
+            self._expandedFiles = completer.expandedFiles()
+
     @staticmethod
     def _isGlob(text):
         return '*' in text or \
@@ -119,9 +126,8 @@ class CommandOpen(AbstractCommand):
         """Check if command is complete and ready to execute
         """
         if self._isGlob(self._path):
-            files = glob.glob(os.path.expanduser(self._path))
-            return files and \
-                all([os.path.isfile(f) for f in files])
+            # Not ready while the glob is being expanded or if it matches not only files
+            return bool(self._expandedFiles)
         else:
             if not self._path:
                 return False
@@ -140,7 +146,7 @@ class CommandOpen(AbstractCommand):
         """
         if self._isGlob(self._path):
             expandedPathes = []
-            for filePath in glob.iglob(os.path.expanduser(self._path)):
+            for filePath in self._expandedFiles:
                 try:
                     absFilePath = os.path.abspath(filePath)
                 except OSError:
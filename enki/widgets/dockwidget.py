@@ -69,6 +69,7 @@ class _TitleBar(QToolBar):
     def on_tbUnPinned_toggled(self, checked):
         core.config()[self._configName] = not checked
         core.config().flush()
+        self.parent().pinnedChanged.emit(not checked)
 
     def paintEvent(self, event):
         """QToolBar.paintEvent reimplementation
@@ -159,6 +160,13 @@ class DockWidget(QDockWidget):
     **Signal** emitted, when dock is shown
     """
 
+    pinnedChanged = pyqtSignal(bool)
+    """
+    pinnedChanged(isPinned)
+
+    **Signal** emitted, when dock is pinned or unpinned
+    """
+
     def __init__(self, parentObject, windowTitle, windowIcon=QIcon(), shortcut=None):
         QDockWidget.__init__(self, parentObject)
         self._showAction = None
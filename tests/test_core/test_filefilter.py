@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import fnmatch
+import os.path
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+from enki.core.filefilter import FileMatcher
+
+
+PATTERNS = [".*", "*~", "*.o", "*.pyc", "*.bak", "__pycache__", "*.class",
+            "*.tar.gz", "build*", "test_[0-9].py", "a?c"]
+
+NAMES = ["", ".git", "file~", "main.o", "main.c", "x.pyc", "pyc", "__pycache__",
+         "__pycache__x", "Main.class", "a.tar.gz", "a.gz", "build", "builder", "rebuild",
+         "test_1.py", "test_a.py", "abc", "abcd", "x.o.c", "o"]
+
+
+class Test(unittest.TestCase):
+
+    def test_1(self):
+        """ Matcher gives the same results as composite regexp
+        """
+        matcher = FileMatcher(PATTERNS)
+        regExp = re.compile('(' + ')|('.join([fnmatch.translate(p) for p in PATTERNS]) + ')')
+        for name in NAMES:
+            self.assertEqual(matcher.isIgnored(name), bool(regExp.match(name)), name)
+            self.assertEqual(matcher.match(name), matcher.isIgnored(name))
+
+    def test_2(self):
+        """ Empty filter doesn't ignore anything
+        """
+        matcher = FileMatcher([])
+        self.assertFalse(matcher.isIgnored('a.o'))
+        self.assertFalse(matcher.isIgnored(''))
+
+    def test_3(self):
+        """ Star ignores everything
+        """
+        matcher = FileMatcher(['*'])
+        self.assertTrue(matcher.isIgnored('a.o'))
+
+
+if __name__ == '__main__':
+    unittest.main()
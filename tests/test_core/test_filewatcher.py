@@ -23,10 +23,10 @@ class Test(base.TestCase):
                        doc1_modified, doc1_removed,
                        doc2_modified, doc2_removed):
         QTest.qWait(sleep * 1000)
-        self.assertEqual(self._doc1._externallyModified, doc1_modified)
-        self.assertEqual(self._doc1._externallyRemoved, doc1_removed)
-        self.assertEqual(self._doc2._externallyModified, doc2_modified)
-        self.assertEqual(self._doc2._externallyRemoved, doc2_removed)
+        self.assertEqual(self._doc1.isExternallyModified(), doc1_modified)
+        self.assertEqual(self._doc1.isExternallyRemoved(), doc1_removed)
+        self.assertEqual(self._doc2.isExternallyModified(), doc2_modified)
+        self.assertEqual(self._doc2.isExternallyRemoved(), doc2_removed)
 
     @base.inMainLoop
     def test_1(self):
@@ -93,5 +93,16 @@ class Test(base.TestCase):
         self._doc1.saveFile()
         self._sleepAndCheck(0, False, False, False, False)
 
+    @base.inMainLoop
+    def test_5(self):
+        # modification time changed, contents not changed
+        os.utime(self._doc1.filePath(), (time.time() + 10, time.time() + 10))
+        self._sleepAndCheck(0.1, False, False, False, False)
+
+        # same size, other contents
+        with open(self._doc1.filePath(), 'w') as file_:
+            file_.write('asdF')
+        self._sleepAndCheck(0.1, True, False, False, False)
+
 if __name__ == '__main__':
     unittest.main()
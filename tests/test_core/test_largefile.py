@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import mmap
+import os.path
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+import enki.core.largefile
+from enki.core.largefile import LineIndex
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self._oldInterval = enki.core.largefile._CHECKPOINT_INTERVAL
+        enki.core.largefile._CHECKPOINT_INTERVAL = 16
+
+        self.lines = [('line {}'.format(i) * (i % 7)).encode('utf8') for i in range(200)]
+        self.file = tempfile.TemporaryFile()
+        self.file.write(b'\n'.join(self.lines))
+        self.file.flush()
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def tearDown(self):
+        enki.core.largefile._CHECKPOINT_INTERVAL = self._oldInterval
+        self.mm.close()
+        self.file.close()
+
+    def test_1(self):
+        # Line offsets and numbers
+        index = LineIndex(self.mm)
+        self.assertTrue(index.build())
+        self.assertTrue(index.isComplete())
+        self.assertEqual(index.progress(), 100)
+        self.assertEqual(index.lineCount(), len(self.lines))
+
+        offset = 0
+        for lineNumber, line in enumerate(self.lines):
+            self.assertEqual(index.lineOffset(lineNumber), offset)
+            self.assertEqual(index.lineNumber(offset), lineNumber)
+            self.assertEqual(index.lineNumber(offset + len(line)), lineNumber)
+            offset += len(line) + 1
+
+    def test_2(self):
+        # Line numbers are counted after the indexed part
+        index = LineIndex(self.mm)
+        index.stop()
+        self.assertFalse(index.build())
+        self.assertFalse(index.isComplete())
+        self.assertEqual(index.lineCount(), 1)
+
+        lastOffset = len(self.mm) - len(self.lines[-1])
+        self.assertEqual(index.lineNumber(lastOffset), len(self.lines) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
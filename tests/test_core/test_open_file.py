@@ -19,6 +19,25 @@ class Test(base.TestCase):
         doc2 = core.workspace().openFile(doc.filePath())
         self.assertTrue(doc is doc2)
 
+    def test_2(self):
+        # Deferred documents are loaded, when activated, or in idle time
+        paths = []
+        for index in range(3):
+            paths.append(os.path.abspath('deferred{}.txt'.format(index)))
+            with open(paths[-1], 'w') as file_:
+                file_.write('text {}'.format(index))
+
+        core.workspace().openFiles(paths, deferLoading=True)
+        documents = [core.workspace().findDocumentForPath(path) for path in paths]
+        self.assertNotIn(None, documents)
+        self.assertTrue(documents[2].isLoadingDeferred())
+
+        core.workspace().setCurrentDocument(documents[2])
+        self.assertFalse(documents[2].isLoadingDeferred())
+
+        self.retryUntilPassed(2000, lambda: self.assertTrue(all(doc.isLoaded() for doc in documents)))
+        self.assertEqual([doc.qutepart.text for doc in documents], ['text 0', 'text 1', 'text 2'])
+
 
 class OpenFail(base.TestCase):
 
@@ -46,7 +65,12 @@ class OpenFail(base.TestCase):
         enki.core.workspace._MAX_SUPPORTED_FILE_SIZE = 3
 
         try:
-            self._runTest('x', "Too big file")
+            # Opened in the read-only viewer
+            self.assertIsNone(core.workspace().openFile('x'))
+            viewers = core.workspace()._largeFileViewers
+            self.assertEqual(len(viewers), 1)
+            viewers[0].close()
+            self.assertEqual(viewers, [])
         finally:
             enki.core.workspace._MAX_SUPPORTED_FILE_SIZE = oldMaxSize
 
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", ".."))
+
+import threading
+
+import enki.lib.fuzzymatch
+from enki.lib.fuzzymatch import CharMaskIndex, ParallelScorer, fuzzyMatch, scoreFiles
+
+
+FILES = ['core/workspace.py', 'core/mainwindow.py', 'core/core.py', 'lib/future.py',
+         'plugins/workspace_commands.py', 'README.md']
+
+
+class Test(unittest.TestCase):
+
+    def _sortedMatches(self, pattern, excluded=()):
+        reversedPattern = pattern[::-1]
+        matches = []
+        for i, path in enumerate(FILES):
+            score, indexes = fuzzyMatch(reversedPattern, path)
+            if indexes and path not in excluded:
+                matches.append((score, i, indexes))
+        matches.sort(key=lambda item: item[0])
+        return matches
+
+    def test_1(self):
+        """ Top files are the same as after sorting all matches
+        """
+        for count in (1, 2, 3, 100):
+            survivors, top = scoreFiles('owoc', FILES, range(len(FILES)), set(), count)
+            self.assertEqual(top, self._sortedMatches('cowo')[:count])
+            self.assertEqual(survivors, [0, 1])
+
+    def test_2(self):
+        """ Excluded files survive, but are not ranked
+        """
+        survivors, top = scoreFiles('owoc', FILES, range(len(FILES)), {'core/workspace.py'}, 10)
+        self.assertEqual(survivors, [0, 1])
+        self.assertEqual([item[1] for item in top], [1])
+
+    def test_3(self):
+        """ Only candidates are checked
+        """
+        survivors, top = scoreFiles('y', FILES, [2, 3, 5], set(), 10)
+        self.assertEqual(survivors, [2, 3])
+
+    def _checkCharMaskIndex(self):
+        index = CharMaskIndex(FILES)
+        self.assertTrue(index.build(threading.Event()))
+        for pattern in ('cowo', 'COWO', 'md', 'y', 'xyz', 'e.p'):
+            matching = [i for i, path in enumerate(FILES)
+                        if fuzzyMatch(pattern.lower()[::-1], path.lower())[1]]
+            for candidates in (range(len(FILES)), [0, 1, 3, 5]):
+                filtered = index.filter(pattern, candidates)
+                self.assertTrue(set(filtered).issubset(candidates))
+                self.assertTrue(set(matching).intersection(candidates).issubset(filtered), pattern)
+        self.assertEqual(index.filter('xyz', range(len(FILES))), [])
+
+    def test_4(self):
+        """ Char mask index never rejects matching files
+        """
+        self._checkCharMaskIndex()
+
+    def test_5(self):
+        """ Char mask index works without NumPy
+        """
+        numpy = enki.lib.fuzzymatch.numpy
+        enki.lib.fuzzymatch.numpy = None
+        try:
+            self._checkCharMaskIndex()
+        finally:
+            enki.lib.fuzzymatch.numpy = numpy
+
+    def test_6(self):
+        """ Progress callback reports top found so far
+        """
+        files = ['dir/file%d.py' % i for i in range(1000)]
+        partialTops = []
+        survivors, top = scoreFiles('py'[::-1], files, range(len(files)), set(), 5,
+                                    onProgress=lambda getTop: partialTops.append(getTop()))
+        self.assertEqual(len(partialTops), 10)
+        self.assertEqual(len(partialTops[0]), 1)
+        self.assertEqual(partialTops[-1][:5], top)
+
+    def test_7(self):
+        """ Parallel scorer gives the same result as scoreFiles and survives file list change
+        """
+        scorer = ParallelScorer(2)
+        try:
+            scorer.start()
+            files = FILES
+            for _ in range(2):
+                expected = scoreFiles('owoc', [f.lower() for f in files], range(len(files)), set(), 10)
+                result = scorer.score('owoc', False, files, list(range(len(files))), set(), 10,
+                                      threading.Event())
+                self.assertEqual(result, expected)
+                files = ['Core/Workspace_old.py'] + FILES
+        finally:
+            scorer.terminate()
+
+        self.assertIsNone(scorer.score('owoc', True, FILES, [0, 1], set(), 10, threading.Event()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import unittest
+
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+from base import WaitForSignal
+
+from PyQt5.QtCore import pyqtSignal, QObject
+from PyQt5.QtTest import QTest
+
+from enki.lib.toolrunner import ToolRunner
+
+
+class Receiver(QObject):
+    done = pyqtSignal()
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.results = []
+
+    def onDone(self, future):
+        try:
+            self.results.append(future.result)
+        except OSError as ex:
+            self.results.append(ex)
+        self.done.emit()
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = ToolRunner()
+        self.receiver = Receiver()
+
+    def tearDown(self):
+        self.runner.terminate()
+
+    def test_1(self):
+        # Output is delivered to the callback
+        with WaitForSignal(self.receiver.done, 3000):
+            self.runner.run(self.receiver.onDone, [sys.executable, '-c', 'print("hello")'])
+        self.assertEqual(self.receiver.results, [('hello\n', '')])
+
+    def test_2(self):
+        # Superseded run is killed. Its callback is not called
+        sleep = [sys.executable, '-c', 'import time; time.sleep(10)']
+        with WaitForSignal(self.receiver.done, 3000):
+            self.runner.run(self.receiver.onDone, sleep, supersedeKey='key')
+            self.runner.run(self.receiver.onDone, [sys.executable, '-c', 'print("new")'], supersedeKey='key')
+        QTest.qWait(200)
+        self.assertEqual(self.receiver.results, [('new\n', '')])
+
+    def test_3(self):
+        # Timeout
+        with WaitForSignal(self.receiver.done, 3000):
+            self.runner.run(self.receiver.onDone, [sys.executable, '-c', 'import time; time.sleep(10)'],
+                            timeout=0.2)
+        self.assertIsInstance(self.receiver.results[0], TimeoutError)
+
+    def test_4(self):
+        # Probe result is cached
+        args = ['-c', 'import time; print(time.time())']
+        self.assertEqual(self.runner.probe(sys.executable, args),
+                         self.runner.probe(sys.executable, args))
+
+        with self.assertRaises(OSError):
+            self.runner.probe('not existing enki tool', ['--version'])
+
+
+if __name__ == '__main__':
+    unittest.main()
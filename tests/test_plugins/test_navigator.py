@@ -16,6 +16,7 @@ from PyQt5.QtTest import QTest
 
 from enki.core.core import core
 from enki.plugins.navigator.ctags import processText
+from enki.plugins.navigator import pythonoutline
 
 
 RUBY_SOURCE = '''class Person
@@ -61,9 +62,11 @@ class Settings(base.TestCase):
 
         def continueFunc(dialog):
             page = dialog._pageForItem["Navigator"]
-            self.assertEqual(page.lExecuteError.text(),
-                             ('You are trying to use etags from the Emacs package, but it is not supported. '
-                              'Use Exuberant Ctags.'))
+            # ctags is checked in the background
+            self.retryUntilPassed(2000,
+                                  lambda: self.assertEqual(page.lExecuteError.text(),
+                                                           ('You are trying to use etags from the Emacs package, '
+                                                            'but it is not supported. Use Exuberant Ctags.')))
 
             QTest.keyClick(dialog, Qt.Key_Enter)
 
@@ -194,7 +197,7 @@ class Gui(base.TestCase):
 
     def _currentItemText(self):
         dock = self.findDock('&Navigator')
-        model = dock._tagModel
+        model = dock._tree.model()
         curr = dock._tree.currentIndex()
         return model.data(curr, Qt.DisplayRole)
 
@@ -204,7 +207,7 @@ class Gui(base.TestCase):
         # Tags are filtered
         document = self.createFile('source.rb', RUBY_SOURCE)
         dock = self.findDock('&Navigator')
-        model = dock._tagModel
+        model = dock._tree.model()
         self.assertEqual(model.rowCount(QModelIndex()), 0)
 
         self.retryUntilPassed(200,
@@ -227,7 +230,7 @@ class Gui(base.TestCase):
         # Up, down, backspace on tree
         document = self.createFile('source.rb', RUBY_SOURCE)
         dock = self.findDock('&Navigator')
-        model = dock._tagModel
+        model = dock._tree.model()
         self.assertEqual(model.rowCount(QModelIndex()), 0)
 
         self.retryUntilPassed(200,
@@ -318,6 +321,14 @@ class Parser(base.TestCase):
         ref = {('Cls', 2): {('foobar', 3): {('func', 4): {}}}}
         self.assertEqual(asDicts(tags), ref)
 
+    def test_4(self):
+        """Built-in Python parser returns the same tags as ctags"""
+        tags = pythonoutline.processText(PY_CODE)
+        ref = {('Cls', 1): {('foobar', 2): {('func', 3): {}}}}
+        self.assertEqual(asDicts(tags), ref)
+        # ctags 'member' kind of methods is shown as 'function'
+        self.assertEqual([tags[0].type, tags[0].children[0].type], ['class', 'function'])
+
 
 if __name__ == '__main__':
     unittest.main()
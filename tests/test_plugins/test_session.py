@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import unittest
+import os.path
+import sys
+
+sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+import base
+
+import enki.core.json_wrapper
+import enki.core.workspace
+import enki.plugins.session
+from enki.core.core import core
+
+
+class Test(base.TestCase):
+
+    def test_1(self):
+        # Files, which failed to open, do not stop restoring the session
+        paths = []
+        for name, text in (('a.txt', 'a'), ('big.txt', 'a big file text'), ('x', 'no access'), ('c.txt', 'c')):
+            paths.append(os.path.abspath(name))
+            with open(paths[-1], 'w') as file_:
+                file_.write(text)
+
+        oldSessionPath = enki.plugins.session._SESSION_FILE_PATH
+        oldMaxSize = enki.core.workspace._MAX_SUPPORTED_FILE_SIZE
+        oldMode = os.stat('x').st_mode
+        try:
+            enki.plugins.session._SESSION_FILE_PATH = os.path.abspath('session.json')
+            enki.core.workspace._MAX_SUPPORTED_FILE_SIZE = 10
+            os.chmod('x', 0)
+            enki.core.json_wrapper.dump(enki.plugins.session._SESSION_FILE_PATH, 'session',
+                                        {'current': paths[-1], 'opened': paths, 'project': None})
+
+            def inDialog(dialog):
+                self.assertEqual(dialog.windowTitle(), "Don't have the access")
+                self.keyClick('Enter')
+
+            self.openDialog(core.restoreSession.emit, inDialog)
+
+            self.assertIsNotNone(core.workspace().findDocumentForPath(paths[0]))
+            self.assertIsNotNone(core.workspace().findDocumentForPath(paths[3]))
+            self.assertEqual(core.workspace().currentDocument().filePath(), paths[3])
+
+            viewers = core.workspace()._largeFileViewers
+            self.assertEqual(len(viewers), 1)
+            viewers[0].close()
+        finally:
+            os.chmod('x', oldMode)
+            enki.core.workspace._MAX_SUPPORTED_FILE_SIZE = oldMaxSize
+            enki.plugins.session._SESSION_FILE_PATH = oldSessionPath
+
+
+if __name__ == '__main__':
+    unittest.main()
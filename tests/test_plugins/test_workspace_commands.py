@@ -7,6 +7,7 @@ import unittest
 import os.path
 import os
 import sys
+import threading
 
 
 sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
@@ -17,6 +18,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtTest import QTest
 
 from enki.core.core import core
+from enki.lib.pathcompleter import GlobCompleter
 
 
 PROJ_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'enki'))
@@ -170,6 +172,40 @@ class Test(base.TestCase):
         self.openDialog(self._openDialog, inDialogFunc)
         self.assertEqual(core.project().path(), os.path.join(PROJ_ROOT, 'core'))
 
+    @base.inMainLoop
+    def test_11(self):
+        """ Open glob, Enter is pressed before the glob is expanded """
+        paths = [os.path.join(self.TEST_FILE_DIR, 'glob{}.txt'.format(index)) for index in range(3)]
+        for path in paths:
+            with open(path, 'w') as file_:
+                file_.write('thedata')
+
+        def inDialogFunc(dialog):
+            self.keyClicks(os.path.join(self.TEST_FILE_DIR, 'glob*.txt').replace('\\', '\\\\'))
+            self.keyClick(Qt.Key_Enter)
+
+        self.openDialog(self._openDialog, inDialogFunc)
+
+        for path in paths:
+            self.assertIsNotNone(core.workspace().findDocumentForPath(path))
+
+    def test_12(self):
+        """ Glob, which matches too many files, is not expanded """
+        for index in range(3):
+            with open(os.path.join(self.TEST_FILE_DIR, 'glob{}.txt'.format(index)), 'w') as file_:
+                file_.write('thedata')
+
+        oldMaxCount = GlobCompleter._MAX_EXPANDED_COUNT
+        GlobCompleter._MAX_EXPANDED_COUNT = 2
+        try:
+            completer = GlobCompleter(os.path.join(self.TEST_FILE_DIR, 'glob*.txt'))
+            completer.load(threading.Event())
+        finally:
+            GlobCompleter._MAX_EXPANDED_COUNT = oldMaxCount
+
+        self.assertIsNone(completer.expandedFiles())
+        self.assertIn('files are not opened', completer._status)
+
 
 if __name__ == '__main__':
     unittest.main()